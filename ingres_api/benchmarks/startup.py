@@ -0,0 +1,87 @@
+"""
+Cold-start benchmark for the API.
+
+Launches `uvicorn ingres_api.main:app` in a fresh process and reports how long
+it takes for the app module to import, for the server to answer /healthz
+(bound and serving), and for /readyz to report every component loaded.
+
+    python -m ingres_api.benchmarks.startup [--runs 3] [--port 8765]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import ingres_api.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], check=True, capture_output=True, text=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def wait_for(server: subprocess.Popen, url: str, start: float, timeout: float, expect_status: int = 200) -> tuple:
+    """
+    Polls `url` until it returns `expect_status`; returns (seconds since start, last JSON body).
+    """
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} before {url} was ready")
+        try:
+            response = httpx.get(url, timeout=1.0)
+            if response.status_code == expect_status:
+                return time.perf_counter() - start, response.json()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def measure_server(port: int, timeout: float) -> dict:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ingres_api.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        healthy, _ = wait_for(server, f"http://127.0.0.1:{port}/healthz", start, timeout)
+        ready, report = wait_for(server, f"http://127.0.0.1:{port}/readyz", start, timeout)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {"healthz_s": healthy, "readyz_s": ready, "load_ms": report.get("load_ms", {})}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    imports, healthz, readyz = [], [], []
+    for run in range(1, args.runs + 1):
+        imports.append(measure_import())
+        result = measure_server(args.port, args.timeout)
+        healthz.append(result["healthz_s"])
+        readyz.append(result["readyz_s"])
+        print(
+            f"run {run}: import {imports[-1]:.2f}s, /healthz {result['healthz_s']:.2f}s, "
+            f"/readyz {result['readyz_s']:.2f}s, components {result['load_ms']}"
+        )
+
+    print(
+        f"median: import {statistics.median(imports):.2f}s, "
+        f"/healthz {statistics.median(healthz):.2f}s, /readyz {statistics.median(readyz):.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,100 @@ class Settings(BaseSettings):
     # Example for API Keys or future secrets
     GEMINI_API_KEY: str | None = None
     GROQ_API_KEY: str | None = None
+    # Extra Groq keys (JSON list in the env); calls are spread across all keys
+    GROQ_API_KEYS: list[str] = []
+
+    # Shared async HTTP pool used by every Groq call
+    GROQ_MAX_CONNECTIONS: int = 200
+    GROQ_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    GROQ_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Micro-batching of embedding + FAISS lookups (0 disables batching)
+    EMBED_BATCH_WINDOW_MS: float = 3.0
+    EMBED_BATCH_MAX_SIZE: int = 32
+
+    # Query embedding cache: in-memory LRU, plus optional sqlite file shared across restarts
+    EMBED_CACHE_SIZE: int = 10000
+    EMBED_CACHE_PATH: str | None = None
+
+    # Semantic cache for /chatbot/intent results (cosine similarity on query embeddings)
+    INTENT_CACHE_ENABLED: bool = True
+    INTENT_CACHE_THRESHOLD: float = 0.98
+    INTENT_CACHE_TTL_SECONDS: float = 3600
+    INTENT_CACHE_MAX_ENTRIES: int = 5000
+
+    # Local kNN intent classifier; answers without Groq when confidence >= threshold
+    LOCAL_INTENT_ENABLED: bool = True
+    LOCAL_INTENT_THRESHOLD: float = 0.8
+
+    # Template answers for trivial intents in NaturalLanguageResponse
+    NL_TEMPLATES_ENABLED: bool = True
+    NL_TEMPLATE_FORCE_LLM_INTENTS: list[str] = []
+
+    # Prompt-token budget for rawData; larger payloads are summarized before prompting
+    NL_RAWDATA_TOKEN_BUDGET: int = 1500
+
+    # "package.module:function" async hook that returns rawData for /chatbot/ask
+    DATA_PROVIDER: str | None = None
+
+    # RAG example selection: candidates retrieved, then MMR/de-duplication under a token budget
+    RAG_CANDIDATE_K: int = 8
+    RAG_MAX_EXAMPLES: int = 5
+    RAG_SIMILARITY_CUTOFF: float = 0.3
+    RAG_DUPLICATE_THRESHOLD: float = 0.95
+    RAG_MMR_LAMBDA: float = 0.7
+    RAG_EXAMPLE_TOKEN_BUDGET: int = 600
+    # Writable directory for live RAG stores; seeded from the packaged stores on first use.
+    # Unset: stores are served read-only from the package.
+    RAG_DATA_DIR: str | None = None
+    # How often store manifests are checked for a new version to hot-swap (0 disables)
+    RAG_RELOAD_INTERVAL_SECONDS: float = 30.0
+
+    # Model cascade: fast model first, strong model only when the fast answer is rejected
+    INTENT_FAST_MODEL: str = "llama-3.1-8b-instant"
+    INTENT_STRONG_MODEL: str | None = "llama-3.3-70b-versatile"
+    INTENT_ESCALATION_CONFIDENCE: float = 0.7
+    NL_FAST_MODEL: str = "llama-3.1-8b-instant"
+    NL_STRONG_MODEL: str | None = "llama-3.3-70b-versatile"
+
+    # Batch endpoints: items per request, LLM calls in flight per request, items embedded per pass
+    BATCH_MAX_ITEMS: int = 5000
+    BATCH_CONCURRENCY: int = 8
+    BATCH_EMBED_CHUNK_SIZE: int = 256
+
+    # Intent corrections: write-ahead log drained into the live intent store in batches.
+    # Off by default; starting it also requires RAG_DATA_DIR and FEEDBACK_ADMIN_TOKEN.
+    FEEDBACK_ENABLED: bool = False
+    FEEDBACK_WAL_PATH: str | None = None  # defaults to feedback.wal.jsonl in RAG_DATA_DIR
+    FEEDBACK_BATCH_SIZE: int = 32
+    FEEDBACK_FLUSH_INTERVAL_SECONDS: float = 10.0
+    FEEDBACK_DUPLICATE_THRESHOLD: float = 0.97
+    FEEDBACK_ADMIN_TOKEN: str | None = None  # required in the X-Admin-Token header of the feedback routes
+
+    # Resilient Groq calls: deadline, retries with backoff, hedging, circuit breaker
+    LLM_DEADLINE_SECONDS: float = 20.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_SECONDS: float = 0.25
+    LLM_BACKOFF_MAX_SECONDS: float = 4.0
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Client-side Groq rate limiting, off unless both limits are set (> 0). They are
+    # the per-key, per-model limits of the Groq account; with several worker
+    # processes sharing the keys, set GROQ_LIMIT_WORKERS so each takes an equal share.
+    GROQ_RPM_LIMIT: int = 0
+    GROQ_TPM_LIMIT: int = 0
+    GROQ_LIMIT_WORKERS: int = 1
+    # How long each priority may queue for capacity
+    LLM_QUEUE_MAX_WAIT_INTERACTIVE: float = 5.0
+    LLM_QUEUE_MAX_WAIT_BATCH: float = 60.0
+    LLM_QUEUE_MAX_WAIT_WARMUP: float = 10.0
+
+    # Retry-After sent with 503 while models are still loading
+    NOT_READY_RETRY_AFTER_SECONDS: int = 5
     class Config:
         env_file = str(Path(__file__).parent / ".env") # Reads variables from .env automatically
         env_file_encoding = "utf-8"
@@ -1,36 +1,55 @@
 import json
-import re
-import groq
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from ingres_api.config import settings
 from ingres_api.utils.logger import logger
+from ingres_api.utils.groq_client import complete_json
+from ingres_api.utils.resilient_llm import CircuitOpenError, get_llm
+from ingres_api.utils.rate_limiter import PRIORITY_WARMUP, RateLimitExceeded
+from ingres_api.models.llm_schemas import IntentPayload
 from ingres_api.detect_intent.fewshots import FEW_SHOT_EXAMPLE
+from ingres_api.detect_intent.semantic_cache import SemanticCache
+from ingres_api.detect_intent.intent_classifier import IntentClassifier
+from ingres_api.detect_intent.entity_extractor import EntityExtractor
+from ingres_api.rag.retriever import INTENT_STORE, RetrievalResult, get_retriever
+from ingres_api.rag.example_selector import ExampleSelector
+from ingres_api.rag.prompt_compiler import PromptCompiler
+from ingres_api.utils.tokens import prompt_sizes
+from ingres_api.utils.metrics import record_error, stage
+from ingres_api.utils.model_cascade import ModelCascade
 
 class DetectIntent:
     def __init__(self):
         """
         Initializes the Groq model with a system prompt.
         """
-        if not settings.GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY is missing. Please set it in your .env file.")
-
-        # Initialize Groq client
-        self.client = groq.Client(api_key=settings.GROQ_API_KEY)
-        
-        # ====== CONFIG FOR RAG ======
-        self.INDEX_FILE = r"ingres_api/detect_intent/rag_store/faiss_index.bin"
-        self.METADATA_FILE = r"ingres_api/detect_intent/rag_store/faiss_metadata.json"
+        # Shared Groq client with deadlines, retries, hedging and a circuit breaker
+        # (it raises ValueError when neither GROQ_API_KEY nor GROQ_API_KEYS is set)
+        self.llm = get_llm()
         
-        self.rag_index = faiss.read_index(self.INDEX_FILE)
-        with open(self.METADATA_FILE, "r", encoding="utf-8") as f:
-            self.rag_metadata = json.load(f)
+        # ====== SHARED RAG RETRIEVER (one encoder per process) ======
+        self.retriever = get_retriever()
+
+        # ====== SEMANTIC CACHE OF PAST INTENT RESULTS ======
+        self.intent_cache = None
+        if settings.INTENT_CACHE_ENABLED:
+            self.intent_cache = SemanticCache(
+                dim=self.retriever.stores[INTENT_STORE].index.d,
+                threshold=settings.INTENT_CACHE_THRESHOLD,
+                ttl_seconds=settings.INTENT_CACHE_TTL_SECONDS,
+                max_entries=settings.INTENT_CACHE_MAX_ENTRIES,
+            )
+
+        # ====== LOCAL kNN CLASSIFIER OVER THE LABELLED RAG EXAMPLES ======
+        self.classifier = None
+        if settings.LOCAL_INTENT_ENABLED:
+            self.classifier = IntentClassifier(threshold=settings.LOCAL_INTENT_THRESHOLD)
+
+        # ====== DETERMINISTIC ENTITY EXTRACTOR (gazetteer + keyword trie) ======
+        self.entity_extractor = EntityExtractor()
+
+        # ====== RAG EXAMPLE SELECTION (MMR + de-duplication under a token budget) ======
+        self.example_selector = ExampleSelector.from_settings()
 
-        # ====== INIT EMBEDDING MODEL ======
-        self.rag_embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-        
-        
         # System prompt (same as Gemini)
         self.system_prompt = f"""  
 You are an intent detection and entity extraction system for a groundwater data chatbot. Your task is to classify a user query into one of the following intents and extract relevant entities.
@@ -99,18 +118,22 @@ Keyword Mapping (for intent/entity extraction):
 - Include a confidence score between 0 and 1.       
 """
 
-        self.model = "llama-3.1-8b-instant"  # Groq model (fast + good for structured output)
+        self.model = settings.INTENT_FAST_MODEL  # Groq model (fast + good for structured output)
+        self.cascade = ModelCascade("intent", settings.INTENT_FAST_MODEL, settings.INTENT_STRONG_MODEL)
 
-        self._warmup_model()
+        # Static prompt prefix compiled once; RAG examples and query go last
+        self.prompt_compiler = PromptCompiler(self.system_prompt)
 
-    def _warmup_model(self):
+    async def _warmup_model(self):
         """
         Warms up the Groq model by sending a dummy request with the system prompt.
         This primes the model and reduces latency for the first real request.
         """
         try:
             dummy_query = "Warm up the model. Respond with an empty JSON object."
-            _ = self.client.chat.completions.create(
+            _ = await self.llm.create(
+                hedge=False,
+                priority=PRIORITY_WARMUP,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": self.system_prompt},
@@ -123,73 +146,134 @@ Keyword Mapping (for intent/entity extraction):
         except Exception as e:
             logger.warning(f"Model warmup failed: {e}")
 
-    def _clean_response(self, text: str) -> str:
+    async def _complete(self, model: str, messages: list) -> dict:
         """
-        Removes Markdown code fences (```json ... ```) if present,
-        and returns only the raw JSON string.
+        One intent-detection completion on `model`, validated against IntentPayload.
         """
-        cleaned = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE)
-        return cleaned.strip()
+        return await complete_json(
+            self.llm, "intent", IntentPayload, model, messages, max_tokens=500, temperature=0
+        )
+
+    def _local_fallback(self, retrieval: RetrievalResult, local_entities: dict) -> dict:
+        """
+        Best local answer while Groq is unavailable: the kNN vote over the
+        retrieved examples, with whatever entities were extracted locally.
+        """
+        classifier = self.classifier or IntentClassifier(threshold=settings.LOCAL_INTENT_THRESHOLD)
+        intent, confidence = classifier.predict(retrieval.examples, retrieval.scores)
+        if intent is None:
+            return {"intent": "unknown", "entities": {}, "confidence": 0.0}
+
+        logger.warning(f"Groq unavailable; answering intent '{intent}' locally (confidence {confidence:.2f})")
+        return {
+            "intent": intent,
+            "entities": self.entity_extractor.for_intent(local_entities, intent),
+            "confidence": round(confidence, 2),
+        }
+
+    @staticmethod
+    def _escalation_reason(parsed) -> str | None:
+        """
+        Why a fast-model answer should be retried on the strong model, if at all.
+        """
+        if parsed.get("intent") in (None, "unknown"):
+            return "unknown_intent"
+        try:
+            confidence = float(parsed.get("confidence", 0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        if confidence < settings.INTENT_ESCALATION_CONFIDENCE:
+            return "low_confidence"
+        return None
 
-    async def detect_intent(self, query: str) -> dict:
+    async def detect_intent(self, query: str, query_vector: np.ndarray = None, retrieval: RetrievalResult = None) -> dict:
         """
         Analyze the user query, detect intent, extract entities,
         and return a JSON-like Python dict.
+        `query_vector` can carry an embedding computed earlier in the request;
+        `retrieval` can carry an intent-store lookup that was already done.
         """
         try:
             logger.info(f"Analyzing query: {query}")
             
             # ====== Step 1: Retrieve relevant RAG examples ======
-            query_vector = self.rag_embedding_model.encode([query], normalize_embeddings=True)
-            query_vector_np = np.array(query_vector, dtype=np.float32)
-            distances, indices = self.rag_index.search(query_vector_np, 5) # top_k=5
-
-            retrieved_examples = []
-            for idx, score in zip(indices[0], distances[0]):
-                if idx == -1:
-                    continue
-                entry = self.rag_metadata[idx]
-                retrieved_examples.append(entry)
-
-            # Convert retrieved examples to string for injection
-            if retrieved_examples:
-                rag_examples_text = json.dumps(retrieved_examples, indent=2, ensure_ascii=False)
-            else:
-                rag_examples_text = "[]"
-                
-            logger.info(f"Retrieved {len(retrieved_examples)} RAG examples for context.")
-
-            prompt = f"Query: {query}\nRespond with ONLY JSON as specified."
-            dynamic_system_prompt = f"{self.system_prompt}\n\n**RAG-Retrieved Few-shot Examples:**\n{rag_examples_text}"
-        
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": dynamic_system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0
-            )
+            if retrieval is None:
+                with stage("intent", "retrieve"):
+                    retrieval = await self.retriever.aretrieve(INTENT_STORE, query, k=settings.RAG_CANDIDATE_K, query_vector=query_vector)
 
-            if not response or not response.choices:
-                logger.error("Empty response from Groq model.")
-                return {
-                    "intent": "unknown",
-                    "entities": {},
-                    "confidence": 0.0
-                }
+            with stage("intent", "entity_extraction"):
+                local_entities = self.entity_extractor.extract(query)
 
-            text_output = response.choices[0].message.content
-            
-            logger.info(f"Raw Groq response: {text_output}")
-            
-            cleaned_text = self._clean_response(text_output)
-            parsed = json.loads(cleaned_text)
+            # ====== Step 2: Serve near-identical past queries with the same entities from the semantic cache ======
+            if self.intent_cache is not None:
+                with stage("intent", "cache_lookup"):
+                    cached = self.intent_cache.lookup(retrieval.query_vector, local_entities)
+                if cached is not None:
+                    return cached
+
+            # ====== Step 3: Answer confident routine intents locally ======
+
+            def entities_for(intent: str):
+                shaped = self.entity_extractor.for_intent(local_entities, intent)
+                return shaped if self.entity_extractor.is_complete(shaped, intent) else None
+
+            local_intent = None
+            if self.classifier is not None:
+                with stage("intent", "local_classifier"):
+                    local_result, local_intent = self.classifier.try_short_circuit(
+                        retrieval.examples, retrieval.scores, extract_entities=entities_for
+                    )
+                if local_result is not None:
+                    return local_result
+
+            with stage("intent", "prompt_build"):
+                # Pick diverse, relevant examples within the token budget, rendered as compact JSON
+                retrieved_examples, rag_examples_text, rag_tokens = self.example_selector.select(
+                    retrieval.store, retrieval, render=self.prompt_compiler.render_example
+                )
+                logger.info(f"Selected {len(retrieved_examples)} of {len(retrieval.examples)} RAG examples for context.")
+
+                prompt = f"Query: {query}\n"
+                if local_entities:
+                    # The LLM only needs to add or correct entities; already-extracted ones can be omitted
+                    prompt += (
+                        f"Pre-extracted entities: {json.dumps(local_entities, ensure_ascii=False)}\n"
+                        "Omit entities that are already correct above; include only missing or corrected ones.\n"
+                    )
+                prompt += "Respond with ONLY JSON as specified."
+                messages = self.prompt_compiler.build_messages(rag_examples_text, prompt)
+                prompt_sizes.record("intent", self.prompt_compiler.prompt_tokens(rag_tokens, prompt))
+
+            # Fast model first; escalate on invalid JSON, unknown intent or low confidence
+            try:
+                parsed = await self.cascade.run(
+                    lambda model: self._complete(model, messages),
+                    self._escalation_reason
+                )
+            except CircuitOpenError as e:
+                record_error("intent", e)
+                return self._local_fallback(retrieval, local_entities)
+
+            # Locally extracted entities fill whatever the LLM left out for its chosen intent
+            if isinstance(parsed, dict) and local_entities:
+                merged = self.entity_extractor.for_intent(local_entities, parsed.get("intent"))
+                merged.update(parsed.get("entities") or {})
+                parsed["entities"] = merged
+
+            if self.classifier is not None:
+                self.classifier.record_llm_result(local_intent, parsed.get("intent"))
+
+            if self.intent_cache is not None and parsed.get("intent") not in (None, "unknown", "error"):
+                self.intent_cache.store(query, retrieval.query_vector, parsed, local_entities)
             return parsed
 
-        except json.JSONDecodeError:
-            logger.error(f"Failed to parse Groq response as JSON: {text_output if 'text_output' in locals() else ''}")
+        except RateLimitExceeded as e:
+            # Surfaced to the client as 429 with Retry-After
+            record_error("intent", e)
+            raise
+        except ValueError as e:
+            # Unrepairable JSON or an answer outside the intent schema
+            record_error("intent", e)
             return {
                 "intent": "unknown",
                 "entities": {},
@@ -197,6 +281,7 @@ Keyword Mapping (for intent/entity extraction):
             }
         except Exception as e:
             logger.error(f"Error during intent detection: {e}")
+            record_error("intent", e)
             return {
                 "intent": "error",
                 "entities": {},
@@ -0,0 +1,310 @@
+import difflib
+import json
+import re
+from pathlib import Path
+
+GAZETTEER_FILE = Path(__file__).parent / "gazetteer.json"
+
+# Keyword phrases → GroundwaterRechargeData column (superset of the prompt's Keyword Mapping)
+METRIC_KEYWORDS = {
+    "total_annual_groundwater_recharge": [
+        "groundwater data", "total recharge", "annual recharge", "groundwater recharge",
+        "total annual groundwater recharge", "annual groundwater recharge", "recharge",
+    ],
+    "monsoon_recharge_from_rainfall": [
+        "monsoon rainfall recharge", "monsoon recharge from rainfall", "monsoon recharge",
+        "recharge from rainfall",
+    ],
+    "monsoon_recharge_from_other_sources": [
+        "monsoon recharge other sources", "monsoon recharge from other sources",
+    ],
+    "non_monsoon_recharge_from_rainfall": [
+        "non monsoon rainfall recharge", "non monsoon recharge from rainfall", "non monsoon recharge",
+    ],
+    "non_monsoon_recharge_from_other_sources": [
+        "non monsoon recharge other sources", "non monsoon recharge from other sources",
+    ],
+    "total_natural_discharge": ["natural discharge", "total natural discharge"],
+    "annual_extractable_groundwater_resource": [
+        "annual extractable resources", "annual extractable resource", "extractable groundwater resource",
+        "annual extractable groundwater resource", "extractable resources",
+    ],
+    "irrigation_annual_extraction": ["irrigation extraction", "irrigation annual extraction", "irrigation"],
+    "industrial_annual_extraction": ["industrial extraction", "industrial annual extraction", "industrial"],
+    "domestic_annual_extraction": ["domestic extraction", "domestic annual extraction", "domestic"],
+    "total_annual_extraction": [
+        "total extraction", "total annual extraction", "annual extraction", "groundwater extraction", "extraction",
+    ],
+    "annual_gw_allocation_for_domestic_use": [
+        "allocation for domestic use", "annual gw allocation for domestic use", "domestic allocation",
+    ],
+    "net_gw_availability_for_future": [
+        "net availability", "net gw availability", "net groundwater availability",
+        "net gw availability for future", "net groundwater availability for future",
+        "groundwater availability", "availability",
+    ],
+    "stage_of_gw_extraction": [
+        "stage of extraction", "stage of groundwater extraction", "stage of gw extraction", "extraction stage",
+    ],
+    "ground_water_depth": ["groundwater depth", "ground water depth", "water level", "water table", "depth"],
+}
+
+# Column → term as spelled in the definition examples (unlisted columns fall back to the column phrase)
+DEFINITION_TERMS = {
+    "stage_of_gw_extraction": "stage of groundwater extraction",
+    "non_monsoon_recharge_from_rainfall": "non-monsoon recharge from rainfall",
+    "non_monsoon_recharge_from_other_sources": "non-monsoon recharge from other sources",
+}
+
+CONDITION_KEYWORDS = {
+    "over-exploited": ["over exploited", "overexploited", "exploited"],
+    "critical": ["critical"],
+    "semi-critical": ["semi critical", "semicritical"],
+    "safe": ["safe"],
+}
+
+UNIT_TYPE_KEYWORDS = {
+    "district": ["districts", "zilon", "zile"],
+    "block": ["blocks"],
+}
+
+# Entity keys the LLM emits for each intent (used to shape locally extracted entities)
+INTENT_ENTITY_KEYS = {
+    "list_units_by_category": ["unit_type", "state_name", "condition", "metric", "metrics", "year"],
+    "list_units_by_condition": ["unit_type", "state_name", "condition", "year"],
+    "compare_states_extraction": ["state_names", "metric", "year", "start_year", "end_year"],
+    "compare_categories_in_state": ["state_name", "metrics", "year"],
+    "get_historical_data": ["state_name", "district_name", "metric", "start_year", "end_year"],
+    "get_state_metric": ["state_name", "metric", "year"],
+    "find_units_by_metric_value": ["unit_type", "state_name", "metric", "operator", "threshold", "year"],
+    "get_data_for_unit": ["district_name", "metric", "year"],
+    "compare_data": ["unit_type", "state_name", "state_names", "metric", "metrics", "year", "start_year", "end_year"],
+    "definition": ["term"],
+}
+
+# Entities an intent cannot be answered without; each tuple needs at least one of its keys
+REQUIRED_ENTITIES = {
+    "get_state_metric": [("state_name",), ("metric",)],
+    "get_data_for_unit": [("district_name",), ("metric",)],
+    "compare_states_extraction": [("state_names",)],
+    "get_historical_data": [("state_name", "district_name"), ("metric",)],
+    "find_units_by_metric_value": [("metric",), ("operator",), ("threshold",)],
+    "list_units_by_condition": [("condition",)],
+    "definition": [("term",)],
+}
+
+# Common query words that must never be fuzzy-matched to a place name
+STOPWORDS = {
+    "about", "above", "across", "after", "annual", "batao", "below", "between", "blocks", "chahiye",
+    "compare", "comparison", "dikhao", "district", "districts", "extraction", "find", "greater", "ground",
+    "groundwater", "highest", "historical", "history", "information", "kitna", "kitni", "lowest", "mujhe",
+    "other", "please", "recharge", "rainfall", "show", "sources", "state", "states", "status", "there",
+    "total", "trend", "water", "where", "which", "world", "their",
+}
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_UNIT = r"\s*(?:%|percent|mcm|bcm|ham|m|meters?|metres?)?"
+_YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+_YEAR_RANGE = re.compile(r"\b((?:19|20)\d{2})\s*(?:-|–|to|till|until|se)\s*((?:19|20)\d{2})\b")
+_BETWEEN = re.compile(r"\bbetween\s+" + _NUMBER + _UNIT + r"\s+(?:and|to|-)\s+" + _NUMBER)
+_GREATER = re.compile(r"(?:\babove|\bmore than|\bgreater than|\bhigher than|\bover|\bexceeding|\bexceeds|>)\s*" + _NUMBER)
+_LESS = re.compile(r"(?:\bbelow|\bless than|\blower than|\bunder|<)\s*" + _NUMBER)
+_HINGLISH = re.compile(_NUMBER + _UNIT + r"\s+se\s+(zyada|jyada|adhik|upar|kam|niche)\b")
+_TOKEN = re.compile(r"[a-z0-9&]+")
+
+
+def _number(text: str):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _tokens(text: str) -> list:
+    return _TOKEN.findall(text.lower().replace("-", " "))
+
+
+class EntityExtractor:
+    def __init__(self, gazetteer_file: Path = GAZETTEER_FILE):
+        """
+        Deterministic, non-LLM extractor for the entity dict DetectIntent returns.
+        Phrases (metrics, categories, unit types, states, districts) are matched
+        leftmost-longest over a word-level trie; place names missed by the trie
+        get a fuzzy pass; years, operators and thresholds come from regexes.
+        """
+        with open(gazetteer_file, "r", encoding="utf-8") as f:
+            gazetteer = json.load(f)
+
+        self._trie = {}
+        for metric, phrases in METRIC_KEYWORDS.items():
+            for phrase in phrases:
+                self._add(phrase, ("metric", metric))
+        for condition, phrases in CONDITION_KEYWORDS.items():
+            for phrase in phrases:
+                self._add(phrase, ("condition", condition))
+        for unit_type, phrases in UNIT_TYPE_KEYWORDS.items():
+            for phrase in phrases:
+                self._add(phrase, ("unit_type", unit_type))
+
+        # Districts first so that a state sharing a name (e.g. Delhi) wins
+        place_names = {}
+        for state, districts in gazetteer["states"].items():
+            for district in districts:
+                place_names[district.lower()] = ("district_name", district)
+        for alias, district in gazetteer.get("district_aliases", {}).items():
+            place_names[alias.lower()] = ("district_name", district)
+        for state in gazetteer["states"]:
+            place_names[state.lower()] = ("state_name", state)
+        for alias, state in gazetteer.get("state_aliases", {}).items():
+            place_names[alias.lower()] = ("state_name", state)
+
+        for name, payload in place_names.items():
+            self._add(name, payload)
+
+        # Fuzzy candidates bucketed by first letter to keep difflib cheap
+        self._fuzzy_places = {}
+        for name, payload in place_names.items():
+            key = " ".join(_tokens(name))
+            if len(key) >= 5:
+                self._fuzzy_places.setdefault(key[0], {})[key] = payload
+
+    def _add(self, phrase: str, payload: tuple):
+        node = self._trie
+        for token in _tokens(phrase):
+            node = node.setdefault(token, {})
+        node["$"] = payload
+
+    def _scan(self, tokens: list) -> tuple:
+        """
+        Leftmost-longest trie matching. Returns (matches, unmatched token positions)
+        where each match is (payload, matched phrase).
+        """
+        matches, unmatched = [], []
+        i = 0
+        while i < len(tokens):
+            node, end, payload = self._trie, None, None
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if "$" in node:
+                    end, payload = j + 1, node["$"]
+            if payload is None:
+                unmatched.append(i)
+                i += 1
+            else:
+                matches.append((payload, " ".join(tokens[i:end])))
+                i = end
+        return matches, unmatched
+
+    def _fuzzy_place(self, text: str):
+        candidates = self._fuzzy_places.get(text[0], {})
+        close = difflib.get_close_matches(text, candidates.keys(), n=1, cutoff=0.85)
+        return candidates[close[0]] if close else None
+
+    def extract(self, query: str) -> dict:
+        """
+        Returns every entity found in the query, in the LLM's entity-dict shape.
+        """
+        text = query.lower()
+        entities = {}
+
+        # ---- Operators and thresholds (removed before year detection) ----
+        between = _BETWEEN.search(text)
+        if between:
+            entities["operator"] = "between"
+            entities["threshold"] = [_number(between.group(1)), _number(between.group(2))]
+            text = text[:between.start()] + " " + text[between.end():]
+        else:
+            for pattern, operator in ((_GREATER, ">"), (_LESS, "<")):
+                match = pattern.search(text)
+                if match:
+                    entities["operator"] = operator
+                    entities["threshold"] = _number(match.group(1))
+                    text = text[:match.start()] + " " + text[match.end():]
+                    break
+            else:
+                match = _HINGLISH.search(text)
+                if match:
+                    entities["operator"] = "<" if match.group(2) in ("kam", "niche") else ">"
+                    entities["threshold"] = _number(match.group(1))
+                    text = text[:match.start()] + " " + text[match.end():]
+
+        # ---- Years ----
+        year_range = _YEAR_RANGE.search(text)
+        if year_range:
+            entities["start_year"] = int(year_range.group(1))
+            entities["end_year"] = int(year_range.group(2))
+        else:
+            year = _YEAR.search(text)
+            if year:
+                entities["year"] = int(year.group(1))
+
+        # ---- Keyword / gazetteer phrases ----
+        tokens = _tokens(text)
+        matches, unmatched = self._scan(tokens)
+
+        # Fuzzy pass over leftover words; adjacent pairs first for multi-word names
+        leftover = set(unmatched)
+        for position in unmatched:
+            if position not in leftover:
+                continue
+            candidates = []
+            if position + 1 in leftover:
+                candidates.append((tokens[position] + " " + tokens[position + 1], 2))
+            candidates.append((tokens[position], 1))
+
+            for candidate, width in candidates:
+                words = candidate.split()
+                if any(not w.isalpha() or w in STOPWORDS for w in words) or len(candidate) < 5:
+                    continue
+                payload = self._fuzzy_place(candidate)
+                if payload is not None:
+                    matches.append((payload, candidate))
+                    leftover.difference_update(range(position, position + width))
+                    break
+
+        states, districts, metrics = [], [], []
+        terms = []
+        for (kind, value), _ in matches:
+            if kind == "state_name" and value not in states:
+                states.append(value)
+            elif kind == "district_name" and value not in districts:
+                districts.append(value)
+            elif kind == "metric":
+                terms.append(DEFINITION_TERMS.get(value, value.replace("_", " ")))
+                if value not in metrics:
+                    metrics.append(value)
+            elif kind == "condition":
+                terms.append(value)
+                entities.setdefault("condition", value)
+            elif kind == "unit_type":
+                entities.setdefault("unit_type", value)
+
+        if len(states) == 1:
+            entities["state_name"] = states[0]
+        elif states:
+            entities["state_names"] = states
+        if districts:
+            entities["district_name"] = districts[0]
+        if len(metrics) == 1:
+            entities["metric"] = metrics[0]
+        elif metrics:
+            entities["metrics"] = metrics
+        if terms:
+            entities["term"] = terms[0]
+        return entities
+
+    def for_intent(self, entities: dict, intent: str) -> dict:
+        """
+        Keeps only the entity keys the given intent uses.
+        """
+        keys = INTENT_ENTITY_KEYS.get(intent, [])
+        return {key: entities[key] for key in keys if key in entities}
+
+    def is_complete(self, entities: dict, intent: str) -> bool:
+        """
+        True when `entities` carry everything `intent` needs to be answered.
+        """
+        required = REQUIRED_ENTITIES.get(intent)
+        if required is None:
+            return False
+        return all(any(key in entities for key in options) for options in required)
@@ -0,0 +1,268 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+import numpy as np
+from ingres_api.config import settings
+from ingres_api.utils.logger import logger
+from ingres_api.utils.text import normalize_query
+from ingres_api.models.llm_schemas import IntentPayload
+from ingres_api.rag.retriever import INTENT_STORE
+from ingres_api.rag.index_builder import IndexBuilder
+from ingres_api.rag.store_files import atomic_write
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+WAL_FILE = "feedback.wal.jsonl"
+
+# Neighbours of a correction inspected for duplicates and superseded examples
+NEIGHBOURS = 5
+
+
+@contextlib.contextmanager
+def _flocked(path: Path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class FeedbackIngestor:
+    def __init__(self, retriever, wal_path: Path, batch_size: int, flush_interval: float,
+                 duplicate_threshold: float, intent_cache=None):
+        """
+        Feeds corrected intent labels back into the live intent RAG store.
+        `submit()` appends a correction to a write-ahead log (JSON lines) and
+        returns; a background task drains the log in batches: it embeds the
+        queries, skips corrections whose near-identical neighbour (cosine >=
+        `duplicate_threshold`) already carries the same label, drops
+        neighbours that carry a different one, and publishes a new store
+        version that the retriever hot-swaps.
+
+        Every worker appends to the same log; draining happens under a file
+        lock with a byte-offset checkpoint, so each correction is applied once.
+        Replaying after a crash is harmless because the builder skips records
+        that are already stored.
+        """
+        self.retriever = retriever
+        self.intent_cache = intent_cache
+        self.wal_path = Path(wal_path)
+        self.checkpoint_path = self.wal_path.with_suffix(".checkpoint")
+        self.lock_path = self.wal_path.with_suffix(".lock")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.duplicate_threshold = duplicate_threshold
+
+        self.builder = IndexBuilder(
+            INTENT_STORE,
+            directory=retriever.stores[INTENT_STORE].directory,
+            encoder=retriever.encode,
+        )
+        self.wal_path.parent.mkdir(parents=True, exist_ok=True)
+        self.wal_path.touch(exist_ok=True)
+        self._unflushed = 0
+        self._wakeup = asyncio.Event()
+
+        self.submitted = 0
+        self.applied = 0
+        self.duplicates = 0
+        self.superseded = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_version = None
+
+    @classmethod
+    def from_settings(cls, retriever, intent_cache=None) -> "FeedbackIngestor":
+        """
+        Raises ValueError unless an admin token and a writable data directory are configured:
+        corrections rewrite the live store, which must neither be open to anonymous
+        clients nor live inside the installed package.
+        """
+        if not settings.FEEDBACK_ADMIN_TOKEN:
+            raise ValueError("FEEDBACK_ADMIN_TOKEN must be set to enable intent feedback")
+        if not settings.RAG_DATA_DIR:
+            raise ValueError("RAG_DATA_DIR must be set to enable intent feedback")
+        return cls(
+            retriever=retriever,
+            wal_path=Path(settings.FEEDBACK_WAL_PATH or Path(settings.RAG_DATA_DIR) / WAL_FILE),
+            batch_size=settings.FEEDBACK_BATCH_SIZE,
+            flush_interval=settings.FEEDBACK_FLUSH_INTERVAL_SECONDS,
+            duplicate_threshold=settings.FEEDBACK_DUPLICATE_THRESHOLD,
+            intent_cache=intent_cache,
+        )
+
+    # ---- write-ahead log ----
+
+    def _append(self, line: bytes):
+        with _flocked(self.wal_path):
+            with open(self.wal_path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def submit(self, query: str, intent: str, entities: dict) -> str:
+        """
+        Validates and durably logs one correction; returns its id.
+        Raises pydantic.ValidationError for an unknown intent.
+        """
+        payload = IntentPayload(intent=intent, entities=entities or {}, confidence=1.0)
+        entry = {
+            "id": uuid.uuid4().hex,
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "query": query.strip(),
+            "intent": payload.intent,
+            "entities": payload.entities,
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        await asyncio.to_thread(self._append, line)
+
+        self.submitted += 1
+        self._unflushed += 1
+        if self._unflushed >= self.batch_size:
+            self._wakeup.set()
+        logger.info(f"Logged intent correction {entry['id']}: '{entry['query']}' -> {entry['intent']}")
+        return entry["id"]
+
+    def _read_checkpoint(self) -> int:
+        try:
+            return int(self.checkpoint_path.read_text().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, offset: int):
+        atomic_write(self.checkpoint_path, lambda f: f.write(str(offset).encode()))
+
+    def _read_pending(self) -> tuple:
+        """
+        Returns (entries, start offset, end offset) for complete log lines after the checkpoint.
+        """
+        offset = self._read_checkpoint()
+        with open(self.wal_path, "rb") as f:
+            if offset > os.fstat(f.fileno()).st_size:  # log was emptied after the checkpoint was written
+                offset = 0
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a line still being written is left for the next round
+        entries = []
+        for raw in data[:end].splitlines():
+            try:
+                entries.append(json.loads(raw))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping unreadable feedback log line: {raw[:80]!r}")
+        return entries, offset, offset + end
+
+    def _compact(self, offset: int):
+        """
+        Empties the log once everything in it has been applied.
+        """
+        with _flocked(self.wal_path):
+            if self.wal_path.stat().st_size == offset:
+                # Checkpoint first: a crash in between only replays already-applied corrections
+                self._write_checkpoint(0)
+                os.truncate(self.wal_path, 0)
+
+    # ---- draining ----
+
+    def _plan(self, entries: list, vectors: np.ndarray) -> tuple:
+        """
+        Splits a batch into records to add, their vectors, and stored examples they supersede.
+        """
+        rag_store = self.retriever.stores[INTENT_STORE]
+        neighbours = rag_store.search(vectors, NEIGHBOURS)
+
+        records, rows, superseded = [], [], []
+        for row, (entry, (examples, scores, _)) in enumerate(zip(entries, neighbours)):
+            response = {"intent": entry["intent"], "entities": entry["entities"], "confidence": 1.0}
+            close = [example for example, score in zip(examples, scores) if score >= self.duplicate_threshold]
+            if any(self._same_label(example, response) for example in close):
+                self.duplicates += 1
+                continue
+            superseded.extend(close)
+            records.append({"query": entry["query"], "response": response})
+            rows.append(row)
+        return records, vectors[rows], superseded
+
+    @staticmethod
+    def _same_label(example: dict, response: dict) -> bool:
+        stored = example.get("response", {})
+        return stored.get("intent") == response["intent"] and stored.get("entities", {}) == response["entities"]
+
+    def flush(self) -> int:
+        """
+        Applies every logged correction not yet in the store; returns how many
+        examples were added. Blocking: run it in a worker thread.
+        """
+        with _flocked(self.lock_path):
+            entries, start, offset = self._read_pending()
+            if not entries:
+                if offset != start:  # only unreadable lines
+                    self._write_checkpoint(offset)
+                return 0
+
+            # A later correction of the same query wins
+            latest = {normalize_query(entry["query"]): entry for entry in entries}
+            batch = list(latest.values())
+            self.duplicates += len(entries) - len(batch)
+
+            self.retriever.reload([INTENT_STORE])  # compare against what other workers already published
+            vectors = self.retriever.encode([entry["query"] for entry in batch])
+            records, record_vectors, superseded = self._plan(batch, vectors)
+
+            manifest = None
+            if records:
+                manifest = self.builder.append(records, vectors=record_vectors, superseded=superseded)
+            self._write_checkpoint(offset)
+            self._compact(offset)
+
+        self.batches += 1
+        if self.intent_cache is not None:
+            for vector in vectors:
+                self.intent_cache.invalidate(vector)
+        if manifest is not None:
+            self.applied += len(records)
+            self.superseded += len(superseded)
+            self.last_version = manifest["version"]
+            self.retriever.reload([INTENT_STORE])
+        logger.info(f"Feedback batch: {len(entries)} corrections, {len(records)} added, {len(superseded)} superseded")
+        return len(records)
+
+    async def run(self):
+        """
+        Background loop (started from the app lifespan): drains the log every
+        `flush_interval` seconds, or sooner once `batch_size` corrections arrive.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._unflushed = 0
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                self.failed_batches += 1
+                logger.error(f"Applying intent feedback failed (will retry): {e}")
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "applied": self.applied,
+            "duplicates": self.duplicates,
+            "superseded": self.superseded,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "pending_bytes": max(self.wal_path.stat().st_size - self._read_checkpoint(), 0),
+            "store_version": self.last_version,
+        }
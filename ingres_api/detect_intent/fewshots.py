@@ -11,7 +11,7 @@ FEW_SHOT_EXAMPLE = [
     "query": "What was the annual recharge in the Jaipur district in 2023?",
     "response": {
       "intent": "get_data_for_unit",
-      "entities": { "district": "Jaipur", "metric": "annual_recharge", "year": 2023 },
+      "entities": { "district": "Jaipur", "metric": "total_annual_groundwater_recharge", "year": 2023 },
       "confidence": 0.96
     }
   },
@@ -19,7 +19,7 @@ FEW_SHOT_EXAMPLE = [
     "query": "Compare the stage of extraction in Maharashtra and Gujarat.",
     "response": {
       "intent": "compare_data",
-      "entities": { "states": ["Maharashtra", "Gujarat"], "metric": "stage_of_extraction", "year": 2023 },
+      "entities": { "states": ["Maharashtra", "Gujarat"], "metric": "stage_of_gw_extraction", "year": 2023 },
       "confidence": 0.94
     }
   },
@@ -27,7 +27,7 @@ FEW_SHOT_EXAMPLE = [
     "query": "Which blocks in Rajasthan have an annual extraction over 500 million cubic meters?",
     "response": {
       "intent": "find_units_by_metric_value",
-      "entities": { "state": "Rajasthan", "metric": "annual_extraction", "operator": "greater_than", "value": 500 },
+      "entities": { "state": "Rajasthan", "metric": "total_annual_extraction", "operator": "greater_than", "value": 500 },
       "confidence": 0.92
     }
   },
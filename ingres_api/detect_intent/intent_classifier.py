@@ -0,0 +1,93 @@
+from collections import defaultdict
+from ingres_api.utils.logger import logger
+from ingres_api.models.llm_schemas import canonical_intent
+
+# Intents whose answer carries no entities, so an intent label alone is a complete result
+ENTITY_FREE_INTENTS = {"general_greeting", "general_help", "thank_you", "unsupported"}
+
+
+class IntentClassifier:
+    def __init__(self, threshold: float):
+        """
+        Local kNN intent classifier over the labelled RAG examples.
+        Each retrieved neighbour votes for its intent, weighted by cosine
+        similarity; confidence is the winning vote share scaled by the best
+        similarity among the winning neighbours.
+        """
+        self.threshold = threshold
+
+        self.predictions = 0
+        self.short_circuits = 0
+        self.compared = 0
+        self.agreements = 0
+
+    def predict(self, examples: list, scores: list) -> tuple:
+        """
+        Returns (intent, confidence) from the neighbours of one query,
+        or (None, 0.0) when there is nothing to vote with. Neighbours labelled
+        with a legacy alias vote for its allowed intent; other labels do not vote.
+        """
+        votes = defaultdict(float)
+        best_similarity = defaultdict(float)
+        for example, score in zip(examples, scores):
+            intent = canonical_intent(example.get("response", {}).get("intent"))
+            if intent is None:
+                continue
+            weight = max(score, 0.0)
+            votes[intent] += weight
+            best_similarity[intent] = max(best_similarity[intent], weight)
+
+        total = sum(votes.values())
+        if total <= 0:
+            return None, 0.0
+
+        self.predictions += 1
+        intent = max(votes, key=votes.get)
+        confidence = (votes[intent] / total) * best_similarity[intent]
+        return intent, confidence
+
+    def try_short_circuit(self, examples: list, scores: list, extract_entities=None) -> tuple:
+        """
+        Returns (result, predicted_intent). `result` is a complete intent dict
+        when the local prediction is confident enough to skip the LLM, else None.
+        `extract_entities(intent)` supplies entities for intents that need them
+        and returns None when it cannot fill them all.
+        """
+        intent, confidence = self.predict(examples, scores)
+        if intent is None or confidence < self.threshold:
+            return None, intent
+
+        if intent in ENTITY_FREE_INTENTS:
+            entities = {}
+        elif extract_entities is not None:
+            entities = extract_entities(intent)
+            if entities is None:
+                return None, intent
+        else:
+            return None, intent
+
+        self.short_circuits += 1
+        logger.info(f"Local classifier answered intent '{intent}' (confidence {confidence:.2f})")
+        return {"intent": intent, "entities": entities, "confidence": round(confidence, 2)}, intent
+
+    def record_llm_result(self, predicted_intent: str | None, llm_intent: str | None):
+        """
+        Tracks how often the local prediction matches the LLM on fallback calls.
+        """
+        if predicted_intent is None or llm_intent is None:
+            return
+        self.compared += 1
+        if predicted_intent == llm_intent:
+            self.agreements += 1
+
+    def stats(self) -> dict:
+        """
+        Returns prediction, short-circuit and LLM agreement counters.
+        """
+        return {
+            "predictions": self.predictions,
+            "short_circuits": self.short_circuits,
+            "compared_with_llm": self.compared,
+            "agreements": self.agreements,
+            "agreement_rate": (self.agreements / self.compared) if self.compared else 0.0,
+        }
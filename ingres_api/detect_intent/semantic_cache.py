@@ -0,0 +1,167 @@
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from ingres_api.utils.logger import logger
+
+# Locally extracted entities that must agree before a cached result is reused:
+# near-identical wording can still name another year, place, metric, category,
+# unit type, threshold or defined term
+KEY_ENTITIES = (
+    "year", "start_year", "end_year",
+    "state_name", "state_names", "district_name",
+    "metric", "metrics", "condition", "unit_type", "term",
+    "operator", "threshold",
+)
+
+# Nearest cached queries checked for one with matching entities
+LOOKUP_NEIGHBOURS = 4
+
+
+def entity_signature(entities: dict | None) -> str:
+    entities = entities or {}
+    return json.dumps([entities.get(key) for key in KEY_ENTITIES], sort_keys=True, default=str)
+
+
+class SemanticCache:
+    def __init__(self, dim: int, threshold: float, ttl_seconds: float, max_entries: int):
+        """
+        Caches parsed intent results keyed by query embedding.
+        A lookup hits when a cached query has cosine similarity >= `threshold`
+        (embeddings are normalized, so inner product == cosine) and the same
+        locally extracted key entities (see KEY_ENTITIES).
+        Entries expire after `ttl_seconds`; beyond `max_entries` the least
+        recently used entry is evicted.
+        """
+        import faiss  # deferred so importing the API does not pay for the native library
+
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self.entries = OrderedDict()  # id -> {"query", "signature", "result", "created_at", "hits"}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.entity_mismatches = 0
+        self._hit_similarity_total = 0.0
+
+    def _remove(self, ids: list):
+        if not ids:
+            return
+        self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        for entry_id in ids:
+            self.entries.pop(entry_id, None)
+
+    def lookup(self, query_vector: np.ndarray, entities: dict = None) -> dict | None:
+        """
+        Returns a copy of the cached result for the closest past query with the
+        same key `entities`, or None when there is none within the similarity threshold.
+        """
+        with self._lock:
+            if self.index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            k = min(LOOKUP_NEIGHBOURS, self.index.ntotal)
+            scores, ids = self.index.search(query_vector.reshape(1, -1).astype(np.float32), k)
+            signature = entity_signature(entities)
+            now = time.monotonic()
+            match, mismatched = None, False
+            for entry_id, score in zip(ids[0], scores[0]):
+                entry_id, score = int(entry_id), float(score)
+                entry = self.entries.get(entry_id)
+                if entry is None or score < self.threshold:
+                    continue
+                if now - entry["created_at"] > self.ttl_seconds:
+                    self._remove([entry_id])
+                    self.expired += 1
+                    continue
+                if entry["signature"] != signature:
+                    mismatched = True
+                    continue
+                match = entry_id, entry, score
+                break
+
+            if match is None:
+                if mismatched:
+                    self.entity_mismatches += 1
+                self.misses += 1
+                return None
+
+            entry_id, entry, score = match
+            self.entries.move_to_end(entry_id)
+            entry["hits"] += 1
+            self.hits += 1
+            self._hit_similarity_total += score
+            logger.info(f"Intent cache hit (similarity {score:.3f}) for cached query: {entry['query']}")
+            return copy.deepcopy(entry["result"])
+
+    def store(self, query: str, query_vector: np.ndarray, result: dict, entities: dict = None):
+        """
+        Adds a parsed intent result under the query's locally extracted `entities`,
+        evicting expired and LRU entries as needed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            stale = [i for i, e in self.entries.items() if now - e["created_at"] > self.ttl_seconds]
+            self._remove(stale)
+            self.expired += len(stale)
+
+            overflow = len(self.entries) + 1 - self.max_entries
+            if overflow > 0:
+                lru_ids = list(self.entries.keys())[:overflow]
+                self._remove(lru_ids)
+                self.evictions += len(lru_ids)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(
+                query_vector.reshape(1, -1).astype(np.float32),
+                np.asarray([entry_id], dtype=np.int64),
+            )
+            self.entries[entry_id] = {
+                "query": query,
+                "signature": entity_signature(entities),
+                "result": copy.deepcopy(result),
+                "created_at": now,
+                "hits": 0,
+            }
+
+    def invalidate(self, query_vector: np.ndarray, max_entries: int = 16) -> int:
+        """
+        Drops cached results for queries within the similarity threshold of
+        `query_vector` (e.g. after their intent was corrected). Returns how many were removed.
+        """
+        with self._lock:
+            if self.index.ntotal == 0:
+                return 0
+            k = min(max_entries, self.index.ntotal)
+            scores, ids = self.index.search(query_vector.reshape(1, -1).astype(np.float32), k)
+            stale = [int(entry_id) for entry_id, score in zip(ids[0], scores[0]) if entry_id != -1 and score >= self.threshold]
+            self._remove(stale)
+            return len(stale)
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss/eviction counters and the mean similarity of hits.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entity_mismatches": self.entity_mismatches,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "avg_hit_similarity": (self._hit_similarity_total / self.hits) if self.hits else 0.0,
+        }
@@ -1,17 +1,32 @@
-from fastapi import APIRouter
-from ingres_api.models.request_models import ChatQuery, NLResponseRequest
+import json
+import math
+import secrets
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from ingres_api.config import settings
+from ingres_api.models.request_models import (
+    ChatQuery, IntentBatchRequest, IntentFeedback, NLResponseBatchRequest, NLResponseRequest,
+)
 from ingres_api.utils.logger import logger
-from ingres_api.detect_intent.detect_intent import DetectIntent
-from ingres_api.natural_response.natural_response import NaturalLanguageResponse
+from ingres_api.lifespan import components
+from ingres_api.pipeline.ask_pipeline import format_server_timing
+from ingres_api.pipeline.batch_runner import BatchRunner
+from ingres_api.rag.retriever import INTENT_STORE, NL_STORE
+from ingres_api.utils.rate_limiter import RateLimitExceeded
+from ingres_api.utils.metrics import log_trace, set_request_id, trace_scope
+from ingres_api.utils.single_flight import SingleFlight, request_key
 
 
 # Add the prefix /chatbot
 router = APIRouter(prefix="/chatbot", tags=["Chatbot"])
 
-# Intialize the AI
-INTENT = DetectIntent()
-NATURAL_RESPONSE = NaturalLanguageResponse()
-
+# The AI components are loaded in the app lifespan; routes fetch them from `components`
+# Identical concurrent requests share one upstream call. Batch items get their own
+# flights: they run at batch priority, which an interactive request must not inherit.
+INTENT_FLIGHT = SingleFlight("intent")
+RESPONSE_FLIGHT = SingleFlight("generate_response")
+BATCH_INTENT_FLIGHT = SingleFlight("intent_batch")
+BATCH_RESPONSE_FLIGHT = SingleFlight("generate_response_batch")
 
 
 # All the routes available
@@ -30,9 +45,14 @@ async def detect_intent(chat_query: ChatQuery):
     Later, connect this to your intent recognition system.
     """
     logger.info("Intent detection endpoint called {}".format(chat_query.uuid or "no-uuid"))
+    set_request_id(chat_query.uuid)
     logger.info(f"Received query: {chat_query.query}")
     # Here you would call your intent recognition logic
-    response = await INTENT.detect_intent(chat_query.query)
+    intent = components.get("intent")
+    response = await INTENT_FLIGHT.do(
+        request_key("intent", chat_query.query),
+        lambda: intent.detect_intent(chat_query.query)
+    )
     logger.info(f"Detected intent: {response}")
     return {"query": chat_query.query, "result": response}
 
@@ -44,11 +64,176 @@ async def generate_natural_response(request: NLResponseRequest):
     Endpoint to generate a natural language response based on intent, query, and raw_data.
     """
     logger.info(f"generate_natural_response called with intent: {request.intent}, query: {request.query}, rawData: {request.rawData}")
-    response = NATURAL_RESPONSE.generate_response(
-        intent=request.intent,
-        query=request.query,
-        rawData=request.rawData or {}
+    set_request_id(request.uuid)
+    natural_response = components.get("natural_response")
+    response = await RESPONSE_FLIGHT.do(
+        request_key(request.intent, request.query, request.rawData or {}),
+        lambda: natural_response.generate_response(
+            intent=request.intent,
+            query=request.query,
+            rawData=request.rawData or {}
+        )
     )
     logger.info(f"Generated natural response: {response}")
     return response
 
+
+@router.post("/generate-response/stream")
+async def stream_natural_response(request: NLResponseRequest):
+    """
+    Streaming variant of /generate-response over Server-Sent Events.
+    Emits `delta` events with nl_response text as tokens arrive, then a
+    `visualization` event and a final `done` event.
+    """
+    logger.info(f"stream_natural_response called with intent: {request.intent}, query: {request.query}")
+    set_request_id(request.uuid)
+    natural_response = components.get("natural_response")
+
+    async def event_stream():
+        async for event, payload in natural_response.stream_response(
+            intent=request.intent,
+            query=request.query,
+            rawData=request.rawData or {}
+        ):
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _batch_runner(requested: int | None, count: int) -> BatchRunner:
+    if count > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch")
+    concurrency = min(requested or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY)
+    return BatchRunner(concurrency=concurrency, chunk_size=settings.BATCH_EMBED_CHUNK_SIZE)
+
+
+async def _ndjson(results, items: list, render):
+    """
+    One JSON line per finished item: its input `index` and `uuid` plus either
+    `render(item, result)` or an `error` with the status it would have had alone.
+    """
+    async for index, result, error in results:
+        line = {"index": index, "uuid": items[index].uuid}
+        if error is None:
+            line.update(render(items[index], result))
+        elif isinstance(error, RateLimitExceeded):
+            line.update(error=str(error), status=429, retry_after=math.ceil(error.retry_after))
+        else:
+            logger.error(f"Batch item {index} failed: {error}")
+            line.update(error=str(error), status=500)
+        yield json.dumps(line, ensure_ascii=False) + "\n"
+
+
+@router.post("/intent:batch")
+async def detect_intent_batch(request: IntentBatchRequest):
+    """
+    Intent detection for many queries in one call. Queries are embedded and
+    searched in vectorized chunks, Groq calls run with bounded concurrency at
+    batch priority, and results stream back as NDJSON in completion order.
+    """
+    intent = components.get("intent")
+    runner = _batch_runner(request.concurrency, len(request.items))
+    logger.info(f"Intent batch endpoint called with {len(request.items)} queries (concurrency {runner.concurrency})")
+
+    def prepare(chunk: list) -> list:
+        return intent.retriever.retrieve_batch(
+            [(INTENT_STORE, item.query, settings.RAG_CANDIDATE_K, None) for item in chunk]
+        )
+
+    async def handle(item: ChatQuery, retrieval):
+        with trace_scope(item.uuid) as trace:
+            result = await BATCH_INTENT_FLIGHT.do(
+                request_key("intent", item.query),
+                lambda: intent.detect_intent(item.query, retrieval=retrieval)
+            )
+        log_trace(trace, "intent:batch item")
+        return result
+
+    results = runner.run(request.items, handle, prepare)
+    return StreamingResponse(
+        _ndjson(results, request.items, lambda item, result: {"query": item.query, "result": result}),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/generate-response:batch")
+async def generate_natural_response_batch(request: NLResponseBatchRequest):
+    """
+    Batch variant of /generate-response, streamed as NDJSON in completion order.
+    """
+    natural_response = components.get("natural_response")
+    runner = _batch_runner(request.concurrency, len(request.items))
+    logger.info(f"Response batch endpoint called with {len(request.items)} items (concurrency {runner.concurrency})")
+
+    def prepare(chunk: list) -> list:
+        return natural_response.retriever.retrieve_batch(
+            [(NL_STORE, item.query, settings.RAG_CANDIDATE_K, None) for item in chunk]
+        )
+
+    async def handle(item: NLResponseRequest, retrieval):
+        with trace_scope(item.uuid) as trace:
+            result = await BATCH_RESPONSE_FLIGHT.do(
+                request_key(item.intent, item.query, item.rawData or {}),
+                lambda: natural_response.generate_response(
+                    intent=item.intent,
+                    query=item.query,
+                    rawData=item.rawData or {},
+                    retrieval=retrieval
+                )
+            )
+        log_trace(trace, "generate-response:batch item")
+        return result
+
+    results = runner.run(request.items, handle, prepare)
+    return StreamingResponse(
+        _ndjson(results, request.items, lambda item, result: {"result": result}),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/ask")
+async def ask(chat_query: ChatQuery, response: Response):
+    """
+    Single-call pipeline: intent detection, data fetch and response generation.
+    Per-stage timings are returned in the Server-Timing header.
+    """
+    logger.info("Ask pipeline endpoint called {}".format(chat_query.uuid or "no-uuid"))
+    set_request_id(chat_query.uuid)
+    result, timings = await components.get("ask_pipeline").run(chat_query.query)
+    response.headers["Server-Timing"] = format_server_timing(timings)
+    logger.info(f"Ask pipeline timings (ms): {timings}")
+    return result
+
+
+def _check_admin_token(token: str | None):
+    if not settings.FEEDBACK_ENABLED:
+        raise HTTPException(status_code=404, detail="Intent feedback is disabled")
+    expected = settings.FEEDBACK_ADMIN_TOKEN
+    if not expected or not token or not secrets.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+
+@router.post("/feedback", status_code=202)
+async def submit_feedback(feedback: IntentFeedback, x_admin_token: str | None = Header(default=None)):
+    """
+    Records a corrected intent/entities label for a query. Corrections are
+    logged immediately and added to the live intent RAG store in the next batch.
+    """
+    _check_admin_token(x_admin_token)
+    logger.info("Intent feedback endpoint called {}".format(feedback.uuid or "no-uuid"))
+    set_request_id(feedback.uuid)
+    feedback_id = await components.get("feedback").submit(feedback.query, feedback.intent, feedback.entities)
+    return {"id": feedback_id, "status": "queued"}
+
+
+@router.get("/feedback")
+async def feedback_stats(x_admin_token: str | None = Header(default=None)):
+    """
+    Counters of the feedback ingestor (submitted, applied, duplicates, pending log bytes).
+    """
+    _check_admin_token(x_admin_token)
+    return components.get("feedback").stats()
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ingres_api.lifespan import components
+
+router = APIRouter(tags=["Health"])
+
+
+@router.get("/healthz")
+async def healthz():
+    """
+    Liveness: the process is up and serving HTTP (models may still be loading).
+    """
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    """
+    Readiness: 200 once every component is loaded, 503 with per-component status before that.
+    """
+    report = components.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
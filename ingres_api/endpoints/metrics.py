@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Response
+from ingres_api.lifespan import components
+from ingres_api.endpoints.chatbot import (
+    BATCH_INTENT_FLIGHT, BATCH_RESPONSE_FLIGHT, INTENT_FLIGHT, RESPONSE_FLIGHT,
+)
+from ingres_api.utils.metrics import CONTENT_TYPE, render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint: latency histograms, Groq token counts and
+    error counters, plus gauges from every loaded component's stats().
+    """
+    stats = components.stats()
+    stats["intent_flight"] = INTENT_FLIGHT.stats()
+    stats["response_flight"] = RESPONSE_FLIGHT.stats()
+    stats["intent_batch_flight"] = BATCH_INTENT_FLIGHT.stats()
+    stats["response_batch_flight"] = BATCH_RESPONSE_FLIGHT.stats()
+    return Response(render_metrics(stats), media_type=CONTENT_TYPE)
@@ -0,0 +1,213 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from ingres_api.config import settings
+from ingres_api.utils.logger import logger
+from ingres_api.utils.groq_client import close_async_client
+
+# Components that must be loaded before the chatbot routes can serve traffic
+REQUIRED_COMPONENTS = ("retriever", "intent", "natural_response", "ask_pipeline")
+
+
+class ComponentNotReady(Exception):
+    """
+    Raised when a route needs a component that is still loading (or failed to load).
+    """
+    def __init__(self, name: str, status: str):
+        super().__init__(f"Component '{name}' is {status}")
+        self.name = name
+        self.status = status
+
+
+class Components:
+    def __init__(self):
+        """
+        Registry of the heavy, process-wide objects (encoder + FAISS stores,
+        intent detector, response generator, ask pipeline, optional feedback ingestor). They are built
+        after the server is already accepting connections, so /healthz answers
+        immediately and /readyz reports progress while models load.
+        """
+        self.instances = {}
+        self.status = {name: "pending" for name in REQUIRED_COMPONENTS}
+        if settings.FEEDBACK_ENABLED:
+            self.status["feedback"] = "pending"
+        self.load_ms = {}
+        self.errors = {}
+        self.warmup = "pending"
+
+        self._tasks = []
+        self.started_at = time.perf_counter()
+
+    @property
+    def ready(self) -> bool:
+        return all(self.status[name] == "ready" for name in REQUIRED_COMPONENTS)
+
+    def get(self, name: str):
+        """
+        Returns a loaded component or raises ComponentNotReady.
+        """
+        status = self.status.get(name, "unknown")
+        if status != "ready":
+            raise ComponentNotReady(name, status)
+        return self.instances[name]
+
+    async def _build(self, name: str, factory):
+        """
+        Runs a blocking constructor in a worker thread and records its outcome.
+        """
+        self.status[name] = "loading"
+        start = time.perf_counter()
+        try:
+            instance = await asyncio.to_thread(factory)
+        except Exception as e:
+            self.status[name] = "failed"
+            self.errors[name] = str(e)
+            logger.error(f"Failed to load component '{name}': {e}")
+            raise
+        self.instances[name] = instance
+        self.status[name] = "ready"
+        self.load_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"Component '{name}' ready in {self.load_ms[name]} ms")
+        return instance
+
+    def _fail_pending(self, error: Exception):
+        """
+        Marks every component that had not finished loading as failed, keeping
+        the error that stopped loading in the /readyz report.
+        """
+        logger.error(f"Component loading stopped: {type(error).__name__}: {error}", exc_info=error)
+        for name, status in self.status.items():
+            if status in ("pending", "loading"):
+                self.status[name] = "failed"
+                self.errors.setdefault(name, f"not loaded: {type(error).__name__}: {error}")
+
+    async def _load(self):
+        # Imported here so that importing the app never pulls in the model stack
+        from ingres_api.rag.retriever import get_retriever
+        from ingres_api.detect_intent.detect_intent import DetectIntent
+        from ingres_api.natural_response.natural_response import NaturalLanguageResponse
+        from ingres_api.pipeline.ask_pipeline import AskPipeline
+
+        try:
+            # The retriever first, so the two detectors don't race to build it
+            await self._build("retriever", get_retriever)
+            intent, natural_response = await asyncio.gather(
+                self._build("intent", DetectIntent),
+                self._build("natural_response", NaturalLanguageResponse),
+            )
+            await self._build("ask_pipeline", lambda: AskPipeline(intent, natural_response))
+        except Exception as e:
+            self._fail_pending(e)
+            return
+
+        logger.info(f"All components ready {round((time.perf_counter() - self.started_at) * 1000, 1)} ms after startup")
+        self._tasks.append(asyncio.create_task(self._warm_up(intent, natural_response)))
+        retriever = self.instances["retriever"]
+        if settings.RAG_RELOAD_INTERVAL_SECONDS > 0:
+            self._tasks.append(asyncio.create_task(retriever.watch(settings.RAG_RELOAD_INTERVAL_SECONDS)))
+        if settings.FEEDBACK_ENABLED:
+            await self._start_feedback(retriever, intent)
+
+    async def _start_feedback(self, retriever, intent):
+        """
+        Optional: a failure here disables /chatbot/feedback but not readiness.
+        """
+        from ingres_api.detect_intent.feedback import FeedbackIngestor
+
+        try:
+            feedback = await self._build("feedback", lambda: FeedbackIngestor.from_settings(retriever, intent.intent_cache))
+        except Exception:
+            return
+        self._tasks.append(asyncio.create_task(feedback.run()))
+
+    async def _warm_up(self, intent, natural_response):
+        """
+        Primes both Groq prompts concurrently; readiness does not wait for this.
+        """
+        self.warmup = "running"
+        await asyncio.gather(intent._warmup_model(), natural_response._warm_up_model())
+        self.warmup = "done"
+
+    def start(self):
+        """
+        Creates the shared Groq client, then loads the components in the background.
+        A configuration error there (e.g. no Groq API key) is raised so that the
+        application fails to start instead of serving 503s that can never clear.
+        """
+        from ingres_api.utils.resilient_llm import get_llm
+
+        self.started_at = time.perf_counter()
+        try:
+            get_llm()
+        except Exception as e:
+            self._fail_pending(e)
+            raise
+        self._tasks.append(asyncio.create_task(self._load()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await close_async_client()
+
+    def stats(self) -> dict:
+        """
+        stats() of every loaded component, keyed by a metric-friendly name (served on /metrics).
+        """
+        from ingres_api.utils.tokens import prompt_sizes
+
+        stats = {"prompt_tokens": prompt_sizes.stats()}
+        retriever = self.instances.get("retriever")
+        if retriever is not None:
+            stats["embedding_cache"] = retriever.embedding_cache.stats()
+            if retriever.batcher is not None:
+                stats["embedding_batcher"] = retriever.batcher.stats()
+            stats["rag_store"] = {
+                name: {"version": store.version, "vectors": store.index.ntotal}
+                for name, store in retriever.stores.items()
+            }
+        intent = self.instances.get("intent")
+        if intent is not None:
+            stats["llm"] = intent.llm.stats()
+            stats["intent_cascade"] = intent.cascade.stats()
+            stats["intent_examples"] = intent.example_selector.stats()
+            stats["intent_prompt"] = intent.prompt_compiler.stats()
+            if intent.intent_cache is not None:
+                stats["intent_cache"] = intent.intent_cache.stats()
+            if intent.classifier is not None:
+                stats["intent_classifier"] = intent.classifier.stats()
+        natural_response = self.instances.get("natural_response")
+        if natural_response is not None:
+            stats["nl_cascade"] = natural_response.cascade.stats()
+            stats["nl_examples"] = natural_response.example_selector.stats()
+            stats["nl_prompt"] = natural_response.prompt_compiler.stats()
+        feedback = self.instances.get("feedback")
+        if feedback is not None:
+            stats["feedback"] = feedback.stats()
+        stats["components_ready"] = {name: status == "ready" for name, status in self.status.items()}
+        return stats
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "components": dict(self.status),
+            "load_ms": dict(self.load_ms),
+            "errors": dict(self.errors),
+            "warmup": self.warmup,
+        }
+
+
+components = Components()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts component loading in the background and releases the Groq
+    connection pools on shutdown.
+    """
+    components.start()
+    yield
+    await components.stop()
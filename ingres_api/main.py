@@ -1,15 +1,71 @@
-from fastapi import FastAPI
+import math
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from ingres_api.config import settings
-from ingres_api.endpoints import chatbot
+from ingres_api.endpoints import chatbot, health, metrics
+from ingres_api.lifespan import ComponentNotReady, lifespan
+from ingres_api.utils.rate_limiter import RateLimitExceeded
+from ingres_api.utils.metrics import REQUEST_SECONDS, log_trace, record_error, trace_scope
+
+
+async def rate_limit_exceeded(request: Request, exc: RateLimitExceeded) -> JSONResponse:
+    """
+    Our own Groq budget is exhausted: tell the client when to retry instead of timing out.
+    """
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+async def component_not_ready(request: Request, exc: ComponentNotReady) -> JSONResponse:
+    """
+    A route was hit before its models finished loading.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(settings.NOT_READY_RETRY_AFTER_SECONDS)},
+    )
+
+
+async def observe_request(request: Request, call_next):
+    """
+    Records request latency per route and starts the request's stage trace.
+    Routes tag the trace with the client's uuid, which is echoed as X-Request-ID.
+    """
+    start = time.perf_counter()
+    with trace_scope() as trace:
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            record_error("http", e)
+            raise
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=path, status=response.status_code)
+    if trace.request_id:
+        response.headers["X-Request-ID"] = trace.request_id
+        log_trace(trace, f"{request.method} {path} {response.status_code}")
+    return response
+
 
 def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.PROJECT_NAME,
         version=settings.API_VERSION,
         debug=settings.DEBUG,
+        lifespan=lifespan,
     )
     # Include Routers
+    app.include_router(health.router)
     app.include_router(chatbot.router)
+    app.include_router(metrics.router)
+    app.middleware("http")(observe_request)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded)
+    app.add_exception_handler(ComponentNotReady, component_not_ready)
     return app
 
 app = create_app()
@@ -0,0 +1,158 @@
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from ingres_api.utils.logger import logger
+from ingres_api.detect_intent.entity_extractor import METRIC_KEYWORDS
+
+# The intents DetectIntent's system prompt allows
+INTENTS = (
+    "list_units_by_category",
+    "list_units_by_condition",
+    "compare_states_extraction",
+    "compare_categories_in_state",
+    "get_historical_data",
+    "get_state_metric",
+    "find_units_by_metric_value",
+    "get_data_for_unit",
+    "compare_data",
+    "definition",
+    "general_greeting",
+    "general_help",
+    "thank_you",
+    "unsupported",
+)
+
+# Intent names older RAG examples (and models imitating them) use for an allowed intent
+INTENT_ALIASES = {
+    "get_definition": "definition",
+    "find_units_by_compound_condition": "find_units_by_metric_value",
+    "list_units_by_compound_condition": "list_units_by_condition",
+    "compare_historical_trends": "get_historical_data",
+    "calculate_percentage": "get_state_metric",
+    "interpretive_query": "compare_data",
+}
+
+
+def canonical_intent(value) -> str | None:
+    """
+    The allowed intent that `value` names, directly or as a legacy alias; None for anything else.
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip().strip("`").lower()
+    value = INTENT_ALIASES.get(value, value)
+    return value if value in INTENTS else None
+
+# GroundwaterRechargeData columns that may appear as a metric entity
+METRIC_COLUMNS = (
+    "monsoon_recharge_from_rainfall",
+    "monsoon_recharge_from_other_sources",
+    "non_monsoon_recharge_from_rainfall",
+    "non_monsoon_recharge_from_other_sources",
+    "total_annual_groundwater_recharge",
+    "total_natural_discharge",
+    "annual_extractable_groundwater_resource",
+    "irrigation_annual_extraction",
+    "industrial_annual_extraction",
+    "domestic_annual_extraction",
+    "total_annual_extraction",
+    "annual_gw_allocation_for_domestic_use",
+    "net_gw_availability_for_future",
+    "stage_of_gw_extraction",
+    "ground_water_depth",
+)
+
+# Columns that identify a row (or when it was measured) rather than measure anything
+IDENTIFIER_COLUMNS = ("id", "uuid", "year", "state_name", "district_name", "block_name")
+
+
+def is_identifier_column(key: str) -> bool:
+    """
+    True for keys like id, year or district_id that must not be charted or ranked as values.
+    """
+    key = key.lower()
+    return key in IDENTIFIER_COLUMNS or key.endswith("_id") or key.endswith("_code")
+
+
+IntentName = Literal[INTENTS]
+
+
+# Keyword phrases ("annual recharge", "stage of extraction") → column, as taught by the prompt
+METRIC_ALIASES = {
+    "_".join(phrase.split()): column
+    for column, phrases in METRIC_KEYWORDS.items()
+    for phrase in phrases
+}
+
+
+def _as_column(value):
+    """
+    Normalizes a model-written metric ("Total Annual Extraction", "annual_recharge")
+    to its column name; returns None when it is neither one of METRIC_COLUMNS nor a keyword alias.
+    """
+    if not isinstance(value, str):
+        return None
+    column = "_".join(value.strip().lower().replace("-", " ").split())
+    if column in METRIC_COLUMNS:
+        return column
+    return METRIC_ALIASES.get(column)
+
+
+class IntentPayload(BaseModel):
+    """
+    Validated intent-detection completion. Legacy intent names and keyword-phrase
+    metrics are mapped onto the schema; unknown intents are rejected and metric
+    entities that still do not match are dropped rather than forwarded.
+    """
+    model_config = ConfigDict(extra="ignore")
+
+    intent: IntentName
+    entities: dict = Field(default_factory=dict)
+    confidence: float = 0.0
+
+    @field_validator("intent", mode="before")
+    @classmethod
+    def _normalize_intent(cls, value):
+        return canonical_intent(value) or value  # unknown names fail the Literal check
+
+    @field_validator("entities", mode="before")
+    @classmethod
+    def _check_metrics(cls, value):
+        if not isinstance(value, dict):
+            return {}
+        entities = dict(value)
+        if "metric" in entities:
+            column = _as_column(entities["metric"])
+            if column is None:
+                logger.warning(f"Dropping unknown metric entity: {entities['metric']}")
+                del entities["metric"]
+            else:
+                entities["metric"] = column
+        if "metrics" in entities:
+            raw = entities["metrics"] if isinstance(entities["metrics"], list) else [entities["metrics"]]
+            columns = [c for c in (_as_column(m) for m in raw) if c is not None]
+            if len(columns) < len(raw):
+                logger.warning(f"Dropping unknown metric entities: {raw}")
+            if columns:
+                entities["metrics"] = list(dict.fromkeys(columns))
+            else:
+                del entities["metrics"]
+        return entities
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _clamp_confidence(cls, value):
+        try:
+            return min(max(float(value), 0.0), 1.0)
+        except (TypeError, ValueError):
+            return 0.0
+
+
+class NLResponsePayload(BaseModel):
+    """
+    Validated response-generation completion.
+    """
+    model_config = ConfigDict(extra="ignore")
+
+    nl_response: str = Field(min_length=1)
+    visualization_data: dict = Field(default_factory=dict)
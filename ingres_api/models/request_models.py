@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from ingres_api.models.llm_schemas import IntentName
 
 class ChatQuery(BaseModel):
     query: str
@@ -8,4 +9,21 @@ class NLResponseRequest(BaseModel):
     intent: str
     query: str
     rawData: dict | None = None
-    uuid: str
\ No newline at end of file
+    uuid: str
+
+
+class IntentBatchRequest(BaseModel):
+    items: list[ChatQuery] = Field(min_length=1)
+    concurrency: int | None = Field(default=None, ge=1)
+
+
+class NLResponseBatchRequest(BaseModel):
+    items: list[NLResponseRequest] = Field(min_length=1)
+    concurrency: int | None = Field(default=None, ge=1)
+
+
+class IntentFeedback(BaseModel):
+    query: str = Field(min_length=1)
+    intent: IntentName
+    entities: dict = Field(default_factory=dict)
+    uuid: str | None = None
@@ -0,0 +1,236 @@
+import re
+import numpy as np
+from ingres_api.models.llm_schemas import METRIC_COLUMNS, is_identifier_column
+
+# Categories used by the groundwater assessment; a breakdown over these is drawn as a pie
+CATEGORIES = {"safe", "semi-critical", "critical", "over-exploited", "saline"}
+
+# Record keys that identify what a row is about, most specific first
+LABEL_KEYS = ("block_name", "block", "district_name", "district", "unit", "state_name", "state", "year")
+CATEGORY_KEYS = ("category", "status", "condition")
+
+# Longest bar chart we emit; larger results are cut to the top-N values
+MAX_BAR_ITEMS = 20
+
+# Percentages and levels: rows sharing a label are averaged, never added up
+NON_ADDITIVE_COLUMNS = ("stage_of_gw_extraction", "ground_water_depth")
+
+# Most lines drawn on one historical chart (one per state, district or block)
+MAX_SERIES = 10
+
+_LEADING_NUMBER = re.compile(r"^\s*(-?\d+(?:,\d{3})*(?:\.\d+)?)")
+
+AXIS_LABELS = {
+    "state_name": "State", "state": "State",
+    "district_name": "District", "district": "District",
+    "block_name": "Block", "block": "Block",
+    "unit": "Unit", "year": "Year",
+}
+
+
+def _to_number(value):
+    """
+    Returns value as float, parsing strings like "4500 MCM" or "45%"; None if not numeric.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _LEADING_NUMBER.match(value)
+        if match:
+            return float(match.group(1).replace(",", ""))
+    return None
+
+
+def _humanize(key: str) -> str:
+    return key.replace("_gw_", "_groundwater_").replace("_", " ").title()
+
+
+def _clean(values: np.ndarray) -> list:
+    rounded = np.round(values, 2)
+    return [None if np.isnan(v) else int(v) if float(v).is_integer() else float(v) for v in rounded]
+
+
+def _is_additive(column: str) -> bool:
+    """
+    Only schema volume columns (recharge, extraction, ...) can be summed across rows.
+    """
+    return column in METRIC_COLUMNS and column not in NON_ADDITIVE_COLUMNS
+
+
+def _chart(chart_type: str, labels, values: np.ndarray, x_axis: str, y_axis: str) -> dict:
+    return {
+        "type": chart_type,
+        "labels": [str(label) for label in labels],
+        "data": _clean(values),
+        "x_axis": x_axis,
+        "y_axis": y_axis,
+    }
+
+
+def _aggregate(labels: list, values: np.ndarray, additive: bool) -> tuple:
+    """
+    Merges values that share a label, preserving first-seen label order:
+    sums for additive volumes, means for everything else.
+    """
+    unique, first_index, inverse = np.unique(np.asarray(labels, dtype=object).astype(str), return_index=True, return_inverse=True)
+    totals = np.bincount(inverse, weights=values, minlength=len(unique))
+    if not additive:
+        totals = totals / np.bincount(inverse, minlength=len(unique))
+    order = np.argsort(first_index)
+    original = [labels[i] for i in first_index[order]]
+    return original, totals[order]
+
+
+def _top_n(labels: list, values: np.ndarray, n: int) -> tuple:
+    if len(labels) <= n:
+        return labels, values
+    top = np.argsort(-values, kind="stable")[:n]
+    return [labels[i] for i in top], values[top]
+
+
+def _from_mapping(intent: str, rawData: dict) -> dict:
+    """
+    Flat {label: number} payloads, e.g. {"Punjab": 850, "Haryana": 620}.
+    """
+    pairs = [(label, _to_number(value)) for label, value in rawData.items()]
+    pairs = [(label, value) for label, value in pairs if value is not None]
+    if len(pairs) < 2:
+        return {}
+
+    labels = [label for label, _ in pairs]
+    values = np.fromiter((value for _, value in pairs), dtype=float, count=len(pairs))
+
+    if all(label.lower() in CATEGORIES for label in labels):
+        return _chart("pie", labels, values, "Category", "Units")
+    if intent == "compare_states_extraction":
+        return _chart("bar", labels, values, "State", "Groundwater Extraction")
+    if intent == "compare_categories_in_state":
+        return _chart("bar", [_humanize(label) for label in labels], values, "Metric", "Value")
+    if intent.startswith("compare"):
+        labels, values = _top_n(labels, values, MAX_BAR_ITEMS)
+        return _chart("bar", labels, values, "", "Value")
+    return {}
+
+
+def _label_key(rows: list, columns: set):
+    """
+    Most specific label column whose values differ between rows (district rows
+    of one state are labelled by district); falls back to the first one present.
+    """
+    present = [key for key in LABEL_KEYS if key in columns]
+    for key in present:
+        if len({str(row.get(key)) for row in rows}) > 1:
+            return key
+    return present[0] if present else None
+
+
+def _value_key(rows: list, label_key: str):
+    """
+    Column to plot: a schema metric column if one is numeric in every row,
+    else the first other numeric column that is not an identifier (id, year, ...).
+    """
+    candidates = [
+        key for key in rows[0]
+        if key != label_key and key not in CATEGORY_KEYS and not is_identifier_column(key)
+        and all(_to_number(row.get(key)) is not None for row in rows)
+    ]
+    metrics = [key for key in candidates if key in METRIC_COLUMNS]
+    return (metrics or candidates or [None])[0]
+
+
+def _series_key(rows: list, columns: set):
+    """
+    Place column that splits a historical result into several lines (e.g. two states), if any.
+    """
+    for key in LABEL_KEYS:
+        if key != "year" and key in columns and len({str(row.get(key)) for row in rows}) > 1:
+            return key
+    return None
+
+
+def _line_chart(rows: list, value_key: str, series_key: str | None) -> dict:
+    """
+    Values over the years: one dataset per `series_key` value, or a single
+    line when no place column varies.
+    """
+    additive = _is_additive(value_key)
+    values = np.fromiter((_to_number(row[value_key]) for row in rows), dtype=float, count=len(rows))
+    if series_key is None:
+        labels, totals = _aggregate([row.get("year") for row in rows], values, additive)
+        order = np.argsort(np.asarray([str(label) for label in labels]), kind="stable")
+        return _chart("line", [labels[i] for i in order], totals[order], "Year", _humanize(value_key))
+
+    years = sorted({str(row.get("year")) for row in rows})
+    series = list(dict.fromkeys(str(row.get(series_key)) for row in rows))[:MAX_SERIES]
+    datasets = []
+    for name in series:
+        positions = [i for i, row in enumerate(rows) if str(row.get(series_key)) == name]
+        labels, totals = _aggregate([str(rows[i].get("year")) for i in positions], values[positions], additive)
+        by_year = dict(zip(labels, totals))
+        line = np.asarray([by_year.get(year, np.nan) for year in years], dtype=float)
+        datasets.append({"label": name, "data": _clean(line)})
+    return {
+        "type": "line",
+        "labels": years,
+        "datasets": datasets,
+        "x_axis": "Year",
+        "y_axis": _humanize(value_key),
+    }
+
+
+def _from_records(intent: str, records: list) -> dict:
+    """
+    Row payloads, e.g. [{"year": 2020, "total_annual_extraction": 410}, ...].
+    """
+    rows = [row for row in records if isinstance(row, dict)]
+    if len(rows) < 2:
+        return {}
+
+    columns = {key for row in rows for key in row}
+    label_key = _label_key(rows, columns)
+    if intent == "get_historical_data" and "year" in columns:
+        label_key = "year"
+    category_key = next((key for key in CATEGORY_KEYS if key in columns), None)
+    value_key = _value_key(rows, label_key)
+
+    if value_key is None or label_key is None:
+        # No numbers to plot: fall back to a breakdown of units per category
+        if category_key is None or intent == "get_historical_data":
+            return {}
+        categories = [str(row.get(category_key, "Unknown")) for row in rows]
+        labels, counts = np.unique(np.asarray(categories), return_counts=True)
+        if len(labels) < 2:
+            return {}
+        return _chart("pie", labels.tolist(), counts.astype(float), "Category", "Units")
+
+    if label_key == "year":
+        return _line_chart(rows, value_key, _series_key(rows, columns))
+
+    labels = [row.get(label_key) for row in rows]
+    values = np.fromiter((_to_number(row[value_key]) for row in rows), dtype=float, count=len(rows))
+    labels, values = _aggregate(labels, values, _is_additive(value_key))
+
+    labels, values = _top_n(labels, values, MAX_BAR_ITEMS)
+    return _chart("bar", labels, values, AXIS_LABELS.get(label_key, _humanize(label_key)), _humanize(value_key))
+
+
+def build_visualization(intent: str, rawData) -> dict:
+    """
+    Derives visualization_data (type, labels, data, x_axis, y_axis) directly
+    from rawData; a historical result covering several places carries one
+    {"label", "data"} entry per place in `datasets` instead of `data`.
+    Returns {} when the payload has nothing worth charting.
+    """
+    if not rawData:
+        return {}
+    if isinstance(rawData, list):
+        return _from_records(intent, rawData)
+    if isinstance(rawData, dict):
+        # Wrapped row lists such as {"results": [...]}
+        nested = [value for value in rawData.values() if isinstance(value, list) and value and isinstance(value[0], dict)]
+        if len(nested) == 1:
+            return _from_records(intent, nested[0])
+        return _from_mapping(intent, rawData)
+    return {}
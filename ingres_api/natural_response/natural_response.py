@@ -1,48 +1,61 @@
+import asyncio
 import json
-import groq
-import faiss
+import re
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from ingres_api.config import settings
 from ingres_api.utils.logger import logger
+from ingres_api.utils.groq_client import complete_json
+from ingres_api.utils.resilient_llm import CircuitOpenError, get_llm
+from ingres_api.utils.rate_limiter import PRIORITY_WARMUP, RateLimitExceeded
+from ingres_api.models.llm_schemas import NLResponsePayload
 from ingres_api.natural_response.few_shot_nl import FEW_SHOT_EXAMPLES
+from ingres_api.natural_response.templates import ResponseTemplates
+from ingres_api.natural_response.chart_builder import build_visualization
+from ingres_api.natural_response.rawdata_reducer import reduce_raw_data, to_compact_json
+from ingres_api.rag.retriever import NL_STORE, RetrievalResult, get_retriever
+from ingres_api.rag.example_selector import ExampleSelector
+from ingres_api.rag.prompt_compiler import PromptCompiler
+from ingres_api.utils.tokens import prompt_sizes
+from ingres_api.utils.metrics import record_error, record_usage, stage
+from ingres_api.utils.model_cascade import ModelCascade
 
 
 class NaturalLanguageResponse:
     def __init__(self):
         """
         Initializes the NaturalLanguageResponse class.
-        - Creates Groq client
+        - Uses the shared resilient Groq client
         - Loads system prompt
-        - Warms up model to avoid latency
-        """
-        if not settings.GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY is missing. Please set it in your .env file.")
-
-        # Initialize Groq client
-        self.client = groq.Client(api_key=settings.GROQ_API_KEY)
-        
-        self.INDEX_FILE = r"ingres_api/natural_response/rag_store_nl/faiss_index.bin"
-        self.METADATA_FILE = r"ingres_api/natural_response/rag_store_nl/faiss_metadata.json"
-        
-        # Load FAISS index + metadata
-        self.rag_index = faiss.read_index(self.INDEX_FILE)
-        with open(self.METADATA_FILE, "r", encoding="utf-8") as f:
-            self.rag_metadata = json.load(f)
-
-        # Initialize embedding model
-        self.rag_embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-        
-        self.model = "llama-3.1-8b-instant"
+        The model warm-up is awaited separately at application startup.
+        """
+        # Shared Groq client with deadlines, retries, hedging and a circuit breaker
+        # (it raises ValueError when neither GROQ_API_KEY nor GROQ_API_KEYS is set)
+        self.llm = get_llm()
+
+
+        # Shared RAG retriever (encoder + FAISS stores loaded once per process)
+        self.retriever = get_retriever()
+        self.example_selector = ExampleSelector.from_settings()
+
+        # Local template answers for trivial intents
+        self.templates = None
+        if settings.NL_TEMPLATES_ENABLED:
+            self.templates = ResponseTemplates(force_llm_intents=settings.NL_TEMPLATE_FORCE_LLM_INTENTS)
+        self.model = settings.NL_FAST_MODEL
+        self.cascade = ModelCascade("natural_response", settings.NL_FAST_MODEL, settings.NL_STRONG_MODEL)
         self.system_prompt = self._build_system_prompt()  # Static system prompt
-        self._warm_up_model()
 
-    def _warm_up_model(self):
+        # Static prompt prefix compiled once; RAG examples, rawData and query go last
+        self.prompt_compiler = PromptCompiler(self.system_prompt, prepare=self._strip_visualization)
+
+    async def _warm_up_model(self):
         """
         Sends a dummy request to warm up the model and reduce cold-start latency.
         """
         try:
-            self.client.chat.completions.create(
+            await self.llm.create(
+                hedge=False,
+                priority=PRIORITY_WARMUP,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": self.system_prompt},
@@ -109,92 +122,261 @@ Keyword Mapping for Understanding:
 
 Your Output Format (strict JSON only):
 {{
-  "nl_response": "A clear, concise, human-readable summary of the result based on raw_data.",
-  "visualization_data": {{
-    "type": "bar | line | pie | doughnut",
-    "labels": ["Label 1", "Label 2"],
-    "data": [numeric_values],
-    "x_axis": "X Axis Label",
-    "y_axis": "Y Axis Label"
-  }}
+  "nl_response": "A clear, concise, human-readable summary of the result based on raw_data."
 }}
+Charts are generated separately from raw_data, so never output visualization_data.
 
 Few-shot examples for guidance:
-{json.dumps(FEW_SHOT_EXAMPLES, indent=2)}
+{json.dumps(self._without_visualization(FEW_SHOT_EXAMPLES), ensure_ascii=False, separators=(",", ":"))}
             
 Rules:
-- If no visualization is needed, set visualization_data to an empty object {{}}.
 - Never output extra text or explanation outside JSON.
 - If raw_data is empty or intent is unsupported, respond gracefully with an informative message in nl_response.
 - Use field names from raw_data to make the answer accurate. If multiple records are present, summarize them meaningfully (aggregating or listing as needed).
 - If numeric data is present, format clearly (e.g., "1500 MCM" or "45%").
-- If query explicitly asks for a chart/graph, populate visualization_data with suitable chart type and labels.
 - Be precise, concise, and factual. Avoid speculation.
 """
 
 
-    def generate_response(self, intent: str, query: str, rawData: dict = None):
+    @staticmethod
+    def _strip_visualization(example: dict) -> dict:
         """
-        Generates a natural language response based on intent, query, and raw data.
-        No conversation history is kept — each request is independent.
+        Drops visualization_data from a few-shot example; the LLM only writes nl_response.
+        """
+        expected = example.get("expected_output")
+        if isinstance(expected, dict):
+            return {**example, "expected_output": {"nl_response": expected.get("nl_response", "")}}
+        return example
+
+    @classmethod
+    def _without_visualization(cls, examples: list) -> list:
+        return [cls._strip_visualization(example) for example in examples]
+
+    async def _build_messages(self, intent: str, query: str, rawData, query_vector: np.ndarray = None, retrieval: RetrievalResult = None) -> list:
+        """
+        Builds the chat messages (system prompt + RAG examples, user turn with
+        intent, query and budgeted rawData). Shared by the blocking and streaming paths.
         """
         # Step 1: Retrieve relevant RAG examples
-        query_vector = self.rag_embedding_model.encode([query], normalize_embeddings=True)
-        query_vector_np = np.array(query_vector, dtype=np.float32)
-        distances, indices = self.rag_index.search(query_vector_np, 5)
+        if retrieval is None:
+            with stage("natural_response", "retrieve"):
+                retrieval = await self.retriever.aretrieve(NL_STORE, query, k=settings.RAG_CANDIDATE_K, query_vector=query_vector)
 
-        retrieved_examples = []
-        for idx, score in zip(indices[0], distances[0]):
-            if idx == -1:
-                continue
-            retrieved_examples.append(self.rag_metadata[idx])
+        with stage("natural_response", "prompt_build"):
+            # Pick diverse, relevant examples within the token budget, rendered as compact JSON
+            retrieved_examples, rag_examples_text, rag_tokens = self.example_selector.select(
+                retrieval.store, retrieval, render=self.prompt_compiler.render_example
+            )
+            logger.info(f"Selected {len(retrieved_examples)} of {len(retrieval.examples)} RAG examples for context.")
 
-        rag_examples_text = json.dumps(retrieved_examples, indent=2, ensure_ascii=False) if retrieved_examples else "[]"
-        logger.info(f"Retrieved {len(retrieved_examples)} RAG examples for context.")
+            # Large result sets are summarized so the prompt stays within the token budget
+            prompt_data, reduced = await asyncio.to_thread(reduce_raw_data, rawData or {}, settings.NL_RAWDATA_TOKEN_BUDGET)
+            if reduced:
+                logger.info(f"rawData reduced to a summary for the prompt (budget {settings.NL_RAWDATA_TOKEN_BUDGET} tokens)")
 
-        # Step 2: Build final system prompt with RAG examples
-        dynamic_system_prompt = f"{self.system_prompt}\n\n**RAG-Retrieved Few-shot Examples:**\n{rag_examples_text}"
+            user_prompt = f"Intent: {intent}\nQuery: {query}\nRaw Data: {to_compact_json(prompt_data)}\nRespond with ONLY JSON as specified."
+            prompt_sizes.record("natural_response", self.prompt_compiler.prompt_tokens(rag_tokens, user_prompt))
 
-        user_message = json.dumps({
-            "intent": intent,
-            "query": query,
-            "rawData": rawData if rawData else {}
-        })
-        
-        query = f"Intent: {intent}\nQuery: {query}\nRaw Data: {json.dumps(rawData) if rawData else '{}'}\nRespond with ONLY JSON as specified."
+            # Step 2: Static system prompt first, variable RAG block + request last
+            return self.prompt_compiler.build_messages(rag_examples_text, user_prompt)
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": dynamic_system_prompt},
-                    {"role": "user", "content": query}
-                ],
-                max_tokens=500,
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
+    async def _complete(self, model: str, messages: list) -> dict:
+        """
+        One response-generation completion on `model`, validated against NLResponsePayload.
+        """
+        return await complete_json(
+            self.llm, "natural_response", NLResponsePayload, model, messages, max_tokens=500, temperature=0.3
+        )
 
-            output = response.choices[0].message.content
+    @staticmethod
+    def _local_fallback(intent: str, rawData) -> dict:
+        """
+        Answer used while Groq is unavailable: the locally built chart with a short note.
+        """
+        logger.warning("Groq unavailable; returning the local fallback response")
+        visualization = build_visualization(intent, rawData)
+        if visualization:
+            text = "I can't write a detailed summary right now, but the chart shows the data for your query."
+        else:
+            text = "I can't generate a detailed answer right now. Please try again in a moment."
+        return {"nl_response": text, "visualization_data": visualization}
 
+    async def generate_response(self, intent: str, query: str, rawData: dict = None, query_vector: np.ndarray = None, retrieval: RetrievalResult = None):
+        """
+        Generates a natural language response based on intent, query, and raw data.
+        No conversation history is kept — each request is independent.
+        `query_vector` can carry an embedding computed earlier in the request;
+        `retrieval` can carry an NL-store lookup that was already done.
+        """
+        # Step 0: Trivial intents are rendered locally without RAG or the LLM
+        if self.templates is not None:
+            templated = self.templates.render(intent, query, rawData)
+            if templated is not None:
+                return templated
+
+        messages = await self._build_messages(intent, query, rawData, query_vector, retrieval)
+
+        try:
+            # Fast model first; escalate when the JSON is unrepairable or has no nl_response
             try:
-                parsed_output = json.loads(output)
-            except json.JSONDecodeError as jde:
-                logger.error(f"JSON decode error: {jde}. Output: {output}")
+                parsed_output = await self.cascade.run(
+                    lambda model: self._complete(model, messages),
+                    lambda parsed: None  # schema problems already raise ValidationError
+                )
+            except ValueError as e:
+                record_error("natural_response", e)
                 return {
                     "nl_response": "Faced error in processing your request",
                     "visualization_data": {}
                 }
+            except CircuitOpenError as e:
+                record_error("natural_response", e)
+                return self._local_fallback(intent, rawData)
 
-            # Ensure keys always exist
+            # Ensure keys always exist; charts are computed from rawData, not by the LLM
             parsed_output.setdefault("nl_response", "No response generated.")
-            parsed_output.setdefault("visualization_data", {})
+            parsed_output["visualization_data"] = build_visualization(intent, rawData)
 
             return parsed_output
 
+        except RateLimitExceeded as e:
+            # Surfaced to the client as 429 with Retry-After
+            record_error("natural_response", e)
+            raise
         except Exception as e:
             logger.error(f"Error during response generation: {e}")
+            record_error("natural_response", e)
             return {
                 "nl_response": f"Error generating response: {e}",
                 "visualization_data": {}
             }
+
+    async def stream_response(self, intent: str, query: str, rawData: dict = None):
+        """
+        Streams the answer as (event, payload) tuples:
+        - ("delta", {"text": ...}) for each piece of nl_response as tokens arrive
+        - ("visualization", visualization_data) once the text is complete
+        - ("done", {"nl_response": full_text}) at the end, or ("error", {...}) on failure
+        """
+        if self.templates is not None:
+            templated = self.templates.render(intent, query, rawData)
+            if templated is not None:
+                yield "delta", {"text": templated["nl_response"]}
+                yield "visualization", templated["visualization_data"]
+                yield "done", {"nl_response": templated["nl_response"]}
+                return
+
+        parser = NlResponseStreamParser()
+
+        try:
+            messages = await self._build_messages(intent, query, rawData)
+            # Groq JSON mode cannot stream, so nl_response is decoded incrementally from the raw JSON text
+            stream = await self.llm.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=500,
+                temperature=0.3,
+                stream=True
+            )
+            with stage("natural_response", "llm_stream"):
+                async for chunk in stream:
+                    # Groq reports usage on the last chunk under x_groq
+                    record_usage(self.model, getattr(getattr(chunk, "x_groq", None), "usage", None))
+                    if not chunk.choices:
+                        continue
+                    text = parser.feed(chunk.choices[0].delta.content or "")
+                    if text:
+                        yield "delta", {"text": text}
+        except CircuitOpenError as e:
+            record_error("natural_response", e)
+            fallback = self._local_fallback(intent, rawData)
+            yield "delta", {"text": fallback["nl_response"]}
+            yield "visualization", fallback["visualization_data"]
+            yield "done", {"nl_response": fallback["nl_response"]}
+            return
+        except RateLimitExceeded as e:
+            record_error("natural_response", e)
+            yield "error", {"message": str(e), "retry_after": round(e.retry_after)}
+            return
+        except Exception as e:
+            logger.error(f"Error during streamed response generation: {e}")
+            record_error("natural_response", e)
+            yield "error", {"message": f"Error generating response: {e}"}
+            return
+
+        remainder = parser.finish()
+        if remainder:
+            yield "delta", {"text": remainder}
+
+        yield "visualization", build_visualization(intent, rawData)
+        yield "done", {"nl_response": parser.text or "No response generated."}
+
+
+class NlResponseStreamParser:
+    """
+    Incrementally extracts the "nl_response" string value from streamed JSON text.
+    feed() returns the newly decoded characters of that value; finish() returns
+    whatever is left, falling back to the raw output when no JSON key was found.
+    """
+    KEY = re.compile(r'"nl_response"\s*:\s*"')
+    ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self.raw = ""
+        self.text = ""
+        self._position = None  # index in raw where the string value continues
+        self._closed = False
+
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self._closed:
+            return ""
+        if self._position is None:
+            match = self.KEY.search(self.raw)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        i = self._position
+        while i < len(self.raw):
+            char = self.raw[i]
+            if char == '"':
+                self._closed = True
+                i += 1
+                break
+            if char == "\\":
+                if i + 1 >= len(self.raw):
+                    break  # escape split across chunks; wait for more text
+                code = self.raw[i + 1]
+                if code == "u":
+                    if i + 6 > len(self.raw):
+                        break
+                    value = int(self.raw[i + 2:i + 6], 16)
+                    if 0xD800 <= value < 0xDC00:  # high surrogate: pair it with the low half that follows
+                        pair = self.raw[i + 6:i + 12]
+                        if len(pair) < 6 and "\\u".startswith(pair[:2]):
+                            break  # the low half may still be on its way
+                        if pair.startswith("\\u") and 0xDC00 <= int(pair[2:], 16) < 0xE000:
+                            decoded.append(chr(0x10000 + (value - 0xD800) * 0x400 + int(pair[2:], 16) - 0xDC00))
+                            i += 12
+                            continue
+                    decoded.append(chr(value))
+                    i += 6
+                    continue
+                decoded.append(self.ESCAPES.get(code, code))
+                i += 2
+                continue
+            decoded.append(char)
+            i += 1
+
+        self._position = i
+        new_text = "".join(decoded)
+        self.text += new_text
+        return new_text
+
+    def finish(self) -> str:
+        if self._position is None and not self.text:
+            self.text = self.raw.strip()
+            return self.text
+        return ""
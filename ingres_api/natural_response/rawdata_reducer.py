@@ -0,0 +1,165 @@
+import json
+import numpy as np
+from ingres_api.models.llm_schemas import METRIC_COLUMNS, is_identifier_column
+
+# Rows kept at each end of the ranking before the budget check trims further
+MAX_EDGE_ROWS = 10
+
+# Rows serialized to extrapolate the size of a large payload
+SAMPLE_ROWS = 50
+
+# Distinct values listed per categorical column in the summary
+MAX_CATEGORY_VALUES = 20
+
+
+def to_compact_json(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough prompt-token estimate (~4 characters per token for English/JSON).
+    """
+    return len(text) // 4 + 1
+
+
+def _as_rows(rawData):
+    """
+    Returns rawData as a list of row dicts, or None when it is not tabular.
+    """
+    if isinstance(rawData, list) and rawData and all(isinstance(row, dict) for row in rawData):
+        return rawData
+    if isinstance(rawData, dict):
+        nested = [v for v in rawData.values() if isinstance(v, list) and v and all(isinstance(r, dict) for r in v)]
+        if len(nested) == 1:
+            return nested[0]
+        if rawData and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in rawData.values()):
+            return [{"label": key, "value": value} for key, value in rawData.items()]
+    return None
+
+
+def _wrapper_scalars(rawData, rows: list) -> dict:
+    """
+    Scalar keys beside the `rows` list of a wrapper dict (e.g. state, year, unit
+    around "results"), which the summary carries over unchanged.
+    """
+    if not isinstance(rawData, dict) or not any(value is rows for value in rawData.values()):
+        return {}
+    return {key: value for key, value in rawData.items() if value is None or isinstance(value, (str, int, float, bool))}
+
+
+def _truncate(text: str, token_budget: int) -> dict:
+    """
+    Keeps the longest prefix of the serialized `text` whose wrapped, re-escaped
+    payload still fits `token_budget` (binary search; escaping only grows it).
+    """
+    def wrap(keep: int) -> dict:
+        return {"truncated": text[:keep], "note": "rawData truncated to fit the prompt"}
+
+    low, high = 0, min(len(text), token_budget * 4)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(to_compact_json(wrap(middle))) <= token_budget:
+            low = middle
+        else:
+            high = middle - 1
+    return wrap(low)
+
+
+def _numeric_column(rows: list, key: str):
+    values = [row.get(key) for row in rows]
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values if v is not None):
+        return None
+    column = np.array([np.nan if v is None else v for v in values], dtype=float)
+    return column if not np.all(np.isnan(column)) else None
+
+
+def _summarize(rows: list) -> tuple:
+    """
+    Column-wise summary statistics. Returns (summary dict, ranking column array, ranking column name).
+    Rows are ranked by the first schema metric column, else the first numeric
+    column that is not an identifier (id, year, ...).
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    numeric_summary, category_counts = {}, {}
+    rankable = {}
+
+    for key in columns:
+        column = _numeric_column(rows, key)
+        if column is not None:
+            numeric_summary[key] = {
+                "min": round(float(np.nanmin(column)), 2),
+                "max": round(float(np.nanmax(column)), 2),
+                "mean": round(float(np.nanmean(column)), 2),
+                "sum": round(float(np.nansum(column)), 2),
+            }
+            if not is_identifier_column(key):
+                rankable[key] = column
+            continue
+
+        values = np.asarray([str(row.get(key)) for row in rows])
+        unique, counts = np.unique(values, return_counts=True)
+        if len(unique) < len(rows):  # repeated values → categorical column worth counting
+            top = np.argsort(-counts, kind="stable")[:MAX_CATEGORY_VALUES]
+            category_counts[key] = {str(unique[i]): int(counts[i]) for i in top}
+
+    rank_key = next((key for key in rankable if key in METRIC_COLUMNS), next(iter(rankable), None))
+    rank_values = rankable.get(rank_key)
+
+    summary = {
+        "row_count": len(rows),
+        "columns": columns,
+        "numeric_summary": numeric_summary,
+        "category_counts": category_counts,
+    }
+    return summary, rank_values, rank_key
+
+
+def reduce_raw_data(rawData, token_budget: int) -> tuple:
+    """
+    Returns (payload, reduced). `payload` is rawData itself when its compact
+    JSON fits `token_budget`; otherwise a summary with statistics, per-category
+    counts and as many top/bottom rows as still fit (plus the scalar keys of a
+    wrapper dict), or the truncated serialized form when rawData is not tabular.
+    """
+    rows = _as_rows(rawData)
+
+    # Extrapolate from a sample first so huge row lists are never fully serialized
+    if rows is not None and len(rows) > SAMPLE_ROWS:
+        sample_tokens = estimate_tokens(to_compact_json(rows[:SAMPLE_ROWS]))
+        clearly_over = sample_tokens * len(rows) / SAMPLE_ROWS > 2 * token_budget
+    else:
+        clearly_over = False
+
+    if not clearly_over:
+        full_text = to_compact_json(rawData)
+        if estimate_tokens(full_text) <= token_budget:
+            return rawData, False
+
+    if rows is None:
+        # Not tabular: nothing sensible to aggregate, so truncate the serialized form
+        return _truncate(full_text, token_budget), True
+
+    summary, rank_values, rank_key = _summarize(rows)
+    summary = {**_wrapper_scalars(rawData, rows), **summary}
+
+    if rank_values is not None:
+        order = np.argsort(np.nan_to_num(-rank_values, nan=np.inf), kind="stable")
+        summary["ranked_by"] = rank_key
+    else:
+        order = np.arange(len(rows))
+
+    edge = min(MAX_EDGE_ROWS, len(rows) // 2)
+    while edge >= 0:
+        candidate = dict(summary)
+        if edge:
+            candidate["top_rows"] = [rows[i] for i in order[:edge]]
+            if rank_values is not None:
+                candidate["bottom_rows"] = [rows[i] for i in order[-edge:][::-1]]
+        if estimate_tokens(to_compact_json(candidate)) <= token_budget:
+            return candidate, True
+        edge = edge // 2 if edge > 1 else -1 if edge == 0 else 0
+
+    # Even the bare summary is over budget; drop the per-category listings
+    summary["category_counts"] = {key: len(counts) for key, counts in summary["category_counts"].items()}
+    return summary, True
@@ -0,0 +1,112 @@
+from ingres_api.utils.logger import logger
+
+GREETING_RESPONSE = "Hello! How can I assist you with groundwater data today?"
+THANK_YOU_RESPONSE = "You're most welcome! Feel free to ask if you need more information."
+HELP_RESPONSE = (
+    "I can help you with information on groundwater status, recharge, extraction, availability, "
+    "historical data, and comparisons between states or districts. Just ask me a question!"
+)
+UNSUPPORTED_RESPONSE = (
+    "I'm sorry, I can only provide information about groundwater data. "
+    "Please ask me about groundwater recharge, extraction, availability or categories."
+)
+
+# rawData keys that name the location a single-value result belongs to
+LOCATION_KEYS = ("state", "state_name", "district", "district_name", "block", "block_name", "unit")
+
+# Units for metrics whose unit is unambiguous from the column name
+METRIC_UNITS = {
+    "stage_of_gw_extraction": "%",
+    "ground_water_depth": " m",
+}
+
+
+def _format_value(key: str, value) -> str:
+    if isinstance(value, float):
+        value = f"{value:,.2f}".rstrip("0").rstrip(".")
+    elif isinstance(value, int):
+        value = f"{value:,}"
+    return f"{value}{METRIC_UNITS.get(key, '')}"
+
+
+def _label(key: str) -> str:
+    return key.replace("_gw_", "_groundwater_").replace("_", " ")
+
+
+class ResponseTemplates:
+    def __init__(self, force_llm_intents: list | None = None):
+        """
+        Renders answers for trivial intents locally instead of calling the LLM.
+        Intents listed in `force_llm_intents` always fall through to the LLM.
+        """
+        self.force_llm_intents = set(force_llm_intents or [])
+        self.renderers = {
+            "general_greeting": self._static(GREETING_RESPONSE),
+            "greeting": self._static(GREETING_RESPONSE),
+            "thank_you": self._static(THANK_YOU_RESPONSE),
+            "general_help": self._static(HELP_RESPONSE),
+            "unsupported": self._static(UNSUPPORTED_RESPONSE),
+            "definition": self._definition,
+            "get_state_metric": self._single_value,
+            "get_data_for_unit": self._single_value,
+        }
+
+    @staticmethod
+    def _static(text: str):
+        return lambda query, rawData: text
+
+    @staticmethod
+    def _definition(query: str, rawData) -> str | None:
+        if not isinstance(rawData, dict) or not rawData.get("definition"):
+            return None
+        definition = str(rawData["definition"]).strip()
+        if not definition:  # blank definitions go to the LLM
+            return None
+        term = rawData.get("term")
+        return f"{term} means {definition[0].lower()}{definition[1:]}" if term else definition
+
+    @staticmethod
+    def _single_value(query: str, rawData) -> str | None:
+        """
+        Handles rawData shaped like {"state": ..., "<metric>": value[, "year": ...]}.
+        """
+        if not isinstance(rawData, dict):
+            return None
+
+        location_key = next((key for key in LOCATION_KEYS if key in rawData), None)
+        if location_key is None:
+            return None
+        values = {k: v for k, v in rawData.items() if k not in (location_key, "year")}
+        if len(values) != 1:
+            return None
+
+        key, value = next(iter(values.items()))
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            return None
+
+        location = rawData[location_key]
+        if location_key.startswith("district"):
+            location = f"{location} district"
+        elif location_key.startswith("block"):
+            location = f"{location} block"
+        year = f" in {rawData['year']}" if rawData.get("year") else ""
+
+        if key in ("status", "category"):
+            return f"{location} is in the {value} category{year}."
+        return f"The {_label(key)} of {location}{year} is {_format_value(key, value)}."
+
+    def render(self, intent: str, query: str, rawData) -> dict | None:
+        """
+        Returns a complete response dict, or None when the LLM should answer.
+        """
+        if intent in self.force_llm_intents:
+            return None
+        renderer = self.renderers.get(intent)
+        if renderer is None:
+            return None
+
+        text = renderer(query, rawData)
+        if text is None:
+            return None
+        logger.info(f"Answered intent '{intent}' from template")
+        return {"nl_response": text, "visualization_data": {}}
@@ -0,0 +1,100 @@
+import asyncio
+import importlib
+import time
+from ingres_api.config import settings
+from ingres_api.utils.logger import logger
+from ingres_api.rag.retriever import INTENT_STORE, NL_STORE
+
+# Stage names, in the order they appear in the Server-Timing header
+STAGES = ("embed", "retrieve", "intent", "data", "generate", "total")
+
+
+async def empty_data_provider(intent_result: dict, query: str):
+    """
+    Default data provider: no database is wired in, so rawData is empty.
+    """
+    return {}
+
+
+def load_data_provider(path: str | None):
+    """
+    Resolves a "package.module:function" path to an async data-provider callable.
+    The callable receives (intent_result, query) and returns rawData.
+    """
+    if not path:
+        return empty_data_provider
+    module_name, _, attribute = path.partition(":")
+    provider = getattr(importlib.import_module(module_name), attribute)
+    logger.info(f"Using data provider {path}")
+    return provider
+
+
+def format_server_timing(timings: dict) -> str:
+    """
+    Renders stage timings (milliseconds) as a Server-Timing header value.
+    """
+    return ", ".join(f"{stage};dur={timings[stage]:.1f}" for stage in STAGES if stage in timings)
+
+
+class AskPipeline:
+    def __init__(self, intent_detector, nl_responder, data_provider=None):
+        """
+        Runs intent detection, the data fetch and response generation for one
+        query in a single request, embedding the query only once.
+        """
+        self.intent_detector = intent_detector
+        self.nl_responder = nl_responder
+        self.retriever = intent_detector.retriever
+        self.data_provider = data_provider or load_data_provider(settings.DATA_PROVIDER)
+
+    def set_data_provider(self, provider):
+        """
+        Replaces the hook that turns a detected intent into rawData.
+        """
+        self.data_provider = provider
+
+    async def run(self, query: str) -> tuple:
+        """
+        Returns (result, timings) where timings maps stage name → milliseconds.
+        """
+        timings = {}
+        start = stage_start = time.perf_counter()
+
+        def lap(stage: str):
+            nonlocal stage_start
+            now = time.perf_counter()
+            timings[stage] = (now - stage_start) * 1000
+            stage_start = now
+
+        # Embed once, then search both RAG stores concurrently with the same vector
+        query_vector = (await asyncio.to_thread(self.retriever.encode, [query]))[0]
+        lap("embed")
+
+        intent_retrieval, nl_retrieval = await asyncio.gather(
+            self.retriever.aretrieve(INTENT_STORE, query, k=settings.RAG_CANDIDATE_K, query_vector=query_vector),
+            self.retriever.aretrieve(NL_STORE, query, k=settings.RAG_CANDIDATE_K, query_vector=query_vector),
+        )
+        lap("retrieve")
+
+        intent_result = await self.intent_detector.detect_intent(query, retrieval=intent_retrieval)
+        lap("intent")
+
+        rawData = await self.data_provider(intent_result, query)
+        lap("data")
+
+        response = await self.nl_responder.generate_response(
+            intent=intent_result.get("intent", "unknown"),
+            query=query,
+            rawData=rawData or {},
+            retrieval=nl_retrieval,
+        )
+        lap("generate")
+
+        timings["total"] = (time.perf_counter() - start) * 1000
+        result = {
+            "query": query,
+            "intent": intent_result,
+            "rawData": rawData,
+            "response": response,
+        }
+        return result, timings
@@ -0,0 +1,61 @@
+import asyncio
+from ingres_api.utils.logger import logger
+from ingres_api.utils.rate_limiter import PRIORITY_BATCH, priority_scope
+
+
+class BatchRunner:
+    def __init__(self, concurrency: int, chunk_size: int, priority: int = PRIORITY_BATCH):
+        """
+        Runs one handler over many items for the batch endpoints:
+        - `prepare(items)` (e.g. one vectorized embed + FAISS search) runs per
+          chunk of `chunk_size` items in a worker thread, so the first LLM calls
+          start while later chunks are still being embedded
+        - at most `concurrency` handlers are in flight, all at `priority`
+        - results are yielded in completion order, not input order
+        """
+        self.concurrency = max(concurrency, 1)
+        self.chunk_size = max(chunk_size, 1)
+        self.priority = priority
+
+    async def _produce(self, items: list, prepare, work: asyncio.Queue, done: asyncio.Queue):
+        for start in range(0, len(items), self.chunk_size):
+            chunk = items[start:start + self.chunk_size]
+            try:
+                contexts = await asyncio.to_thread(prepare, chunk) if prepare else [None] * len(chunk)
+            except Exception as e:
+                logger.error(f"Batch preparation failed for items {start}-{start + len(chunk) - 1}: {e}")
+                for offset in range(len(chunk)):
+                    await done.put((start + offset, None, e))
+                continue
+            for offset, (item, context) in enumerate(zip(chunk, contexts)):
+                await work.put((start + offset, item, context))
+
+    async def _work(self, handler, work: asyncio.Queue, done: asyncio.Queue):
+        with priority_scope(self.priority):
+            while True:
+                index, item, context = await work.get()
+                try:
+                    await done.put((index, await handler(item, context), None))
+                except Exception as e:
+                    await done.put((index, None, e))
+
+    async def run(self, items: list, handler, prepare=None):
+        """
+        Yields (index, result, error) once per item; `error` is the exception
+        raised by `prepare` or `handler(item, context)`, else None.
+        Stopping the iteration (e.g. the client disconnected) cancels the in-flight work.
+        """
+        work = asyncio.Queue(maxsize=self.concurrency)  # backpressure on preparation
+        done = asyncio.Queue()
+        tasks = [asyncio.create_task(self._produce(items, prepare, work, done))]
+        tasks += [
+            asyncio.create_task(self._work(handler, work, done))
+            for _ in range(min(self.concurrency, len(items)))
+        ]
+        try:
+            for _ in range(len(items)):
+                yield await done.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+from ingres_api.utils.logger import logger
+from ingres_api.utils.metrics import stage
+
+
+class EmbeddingBatcher:
+    def __init__(self, retrieve_batch, window_ms: float, max_batch_size: int):
+        """
+        Collects retrieval requests that arrive within `window_ms` (or until
+        `max_batch_size` are queued) and serves them with one batched encode
+        plus one batched FAISS search per store.
+
+        `retrieve_batch` is a sync callable taking a list of
+        (store, query, k, query_vector) tuples and returning one result per tuple.
+        Each caller's wait is timed into its own request trace as
+        retriever.batched_lookup; the shared encode/search stages only feed the
+        global histograms.
+        """
+        self.retrieve_batch = retrieve_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+        # Counters for sizing the window
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # Own context: the worker outlives the request that started it and must not record into its trace
+            self._worker = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+
+    async def submit(self, store: str, query: str, k: int, query_vector=None):
+        """
+        Queues one retrieval and waits for its slot in the next batch.
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        with stage("retriever", "batched_lookup"):
+            await self._queue.put(((store, query, k, query_vector), future))
+            return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            requests = [request for request, _ in batch]
+
+            try:
+                results = await asyncio.to_thread(self.retrieve_batch, requests)
+            except Exception as e:
+                logger.error(f"Batched retrieval failed for {len(batch)} queries: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        """
+        Returns batch counters and the running average batch size.
+        """
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+        }
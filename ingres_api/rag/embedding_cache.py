@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from ingres_api.utils.logger import logger
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, max_entries: int, disk_path: str | None = None):
+        """
+        Two-tier cache of query embeddings keyed by normalized query text.
+        - Memory tier: bounded LRU (OrderedDict).
+        - Disk tier (optional): sqlite table of float32 blobs, survives restarts
+          and is shared by every worker pointed at the same file.
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, key))"
+            )
+            self._db.commit()
+            logger.info(f"Embedding disk cache opened at {disk_path}")
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: list) -> list:
+        """
+        Returns the cached vector for each key, or None where it is missing.
+        """
+        found = [None] * len(keys)
+        disk_lookup = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    found[i] = vector
+                else:
+                    disk_lookup.append(i)
+
+            if self._db is not None and disk_lookup:
+                for i in disk_lookup:
+                    row = self._db.execute(
+                        "SELECT vector FROM embeddings WHERE model = ? AND key = ?",
+                        (self.model_name, keys[i]),
+                    ).fetchone()
+                    if row is not None:
+                        vector = np.frombuffer(row[0], dtype=np.float32)
+                        self._remember(keys[i], vector)
+                        self.disk_hits += 1
+                        found[i] = vector
+
+            self.misses += sum(1 for vector in found if vector is None)
+        return found
+
+    def put_many(self, keys: list, vectors) -> None:
+        """
+        Stores freshly encoded vectors in both tiers.
+        """
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, np.asarray(vector, dtype=np.float32))
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                    [
+                        (self.model_name, key, np.asarray(vector, dtype=np.float32).tobytes())
+                        for key, vector in zip(keys, vectors)
+                    ],
+                )
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and current memory-tier occupancy.
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": ((self.memory_hits + self.disk_hits) / lookups) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,102 @@
+import json
+import numpy as np
+from ingres_api.config import settings
+from ingres_api.utils.tokens import count_tokens
+
+
+def to_compact_example(example: dict) -> str:
+    return json.dumps(example, ensure_ascii=False, separators=(",", ":"))
+
+
+class ExampleSelector:
+    def __init__(self, max_examples: int, similarity_cutoff: float, duplicate_threshold: float,
+                 mmr_lambda: float, token_budget: int):
+        """
+        Chooses which retrieved neighbours go into a prompt:
+        - drops candidates below `similarity_cutoff` to the query
+        - orders the rest by maximal marginal relevance (MMR) and skips
+          near-duplicates of already chosen examples (`duplicate_threshold`)
+        - stops at `max_examples` or when the compact JSON would exceed `token_budget`
+        """
+        self.max_examples = max_examples
+        self.similarity_cutoff = similarity_cutoff
+        self.duplicate_threshold = duplicate_threshold
+        self.mmr_lambda = mmr_lambda
+        self.token_budget = token_budget
+
+        self.candidates_seen = 0
+        self.selected = 0
+        self.dropped_low_similarity = 0
+        self.dropped_duplicates = 0
+        self.dropped_budget = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_examples=settings.RAG_MAX_EXAMPLES,
+            similarity_cutoff=settings.RAG_SIMILARITY_CUTOFF,
+            duplicate_threshold=settings.RAG_DUPLICATE_THRESHOLD,
+            mmr_lambda=settings.RAG_MMR_LAMBDA,
+            token_budget=settings.RAG_EXAMPLE_TOKEN_BUDGET,
+        )
+
+    def select(self, store, retrieval, render=None) -> tuple:
+        """
+        Returns (examples, rendered_text, tokens) for one RetrievalResult.
+        `store` is the RagStore the result came from (used for candidate vectors);
+        `render(store, index)` returns the (text, tokens) fragment for one example,
+        by default compact JSON counted on the spot.
+        """
+        scores = np.asarray(retrieval.scores, dtype=np.float32)
+        self.candidates_seen += len(scores)
+
+        keep = [i for i, score in enumerate(scores) if score >= self.similarity_cutoff]
+        self.dropped_low_similarity += len(scores) - len(keep)
+        if not keep:
+            return [], "[]", 1
+
+        vectors = store.vectors([retrieval.indices[i] for i in keep])
+        pairwise = vectors @ vectors.T
+        relevance = scores[keep]
+
+        chosen, parts, tokens = [], [], 2  # 2 for the enclosing brackets
+        remaining = list(range(len(keep)))
+        while remaining and len(chosen) < self.max_examples:
+            if chosen:
+                redundancy = pairwise[np.ix_(remaining, chosen)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            mmr = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(mmr))
+            candidate = remaining.pop(best)
+
+            if redundancy[best] >= self.duplicate_threshold:
+                self.dropped_duplicates += 1
+                continue
+
+            if render is not None:
+                text, cost = render(store, retrieval.indices[keep[candidate]])
+            else:
+                text = to_compact_example(retrieval.examples[keep[candidate]])
+                cost = count_tokens(text)
+            cost += 1  # separating comma
+            if tokens + cost > self.token_budget:
+                self.dropped_budget += 1
+                continue
+
+            chosen.append(candidate)
+            parts.append(text)
+            tokens += cost
+
+        self.selected += len(chosen)
+        examples = [retrieval.examples[keep[i]] for i in chosen]
+        return examples, "[" + ",".join(parts) + "]", tokens
+
+    def stats(self) -> dict:
+        return {
+            "candidates_seen": self.candidates_seen,
+            "selected": self.selected,
+            "dropped_low_similarity": self.dropped_low_similarity,
+            "dropped_duplicates": self.dropped_duplicates,
+            "dropped_budget": self.dropped_budget,
+        }
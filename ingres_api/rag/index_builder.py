@@ -0,0 +1,365 @@
+"""
+Offline builder for the RAG stores.
+
+    python -m ingres_api.rag.index_builder build intent
+    python -m ingres_api.rag.index_builder build nl --index-type hnsw
+    python -m ingres_api.rag.index_builder append intent --source new_examples.json
+
+`build` embeds every example of the store's source file (few_shot_examples.json
+or few_shot_examples_nl.json by default); `append` embeds only the records that
+are not in the current version and adds them to a copy of its index. Either way
+a new version is written next to the old one and published by atomically
+replacing the store's manifest, which running servers pick up via
+Retriever.reload(). Stores are written under RAG_DATA_DIR when it is set,
+otherwise into the packaged store directories.
+"""
+import argparse
+import contextlib
+import json
+import math
+import time
+from pathlib import Path
+import numpy as np
+
+from ingres_api.utils.logger import logger
+from ingres_api.models.llm_schemas import canonical_intent
+from ingres_api.rag.retriever import EMBEDDING_MODEL_NAME, INTENT_STORE, NL_STORE, PACKAGE_DIR, RAG_STORES, store_directory
+from ingres_api.rag.store_files import (
+    MetadataStore, atomic_write, read_manifest, write_manifest, write_metadata,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+# Source example files per store
+STORE_SOURCES = {
+    INTENT_STORE: PACKAGE_DIR / "detect_intent" / "few_shot_examples.json",
+    NL_STORE: PACKAGE_DIR / "natural_response" / "few_shot_examples_nl.json",
+}
+
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivfpq")
+
+# Corpus sizes at which "auto" moves to the next index type. Exact search stays
+# sub-millisecond up to ~10k vectors; HNSW up to a few hundred thousand; beyond
+# that IVF-PQ keeps memory and latency flat.
+HNSW_MIN_VECTORS = 10_000
+IVFPQ_MIN_VECTORS = 200_000
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+IVF_TRAIN_SAMPLE_PER_LIST = 64
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_KEEP_VERSIONS = 2
+
+
+def choose_index_type(count: int) -> str:
+    if count >= IVFPQ_MIN_VECTORS:
+        return "ivfpq"
+    if count >= HNSW_MIN_VECTORS:
+        return "hnsw"
+    return "flat"
+
+
+def example_text(record: dict) -> str:
+    """
+    The text that is embedded for a stored example (its user query).
+    """
+    return record["query"]
+
+
+def checked_positions(store: str, records: list) -> tuple:
+    """
+    Returns (records, positions kept). Intent examples get their label mapped
+    onto the intent enum (legacy aliases included); examples with any other
+    label are dropped so the classifier never votes for it.
+    """
+    if store != INTENT_STORE:
+        return records, list(range(len(records)))
+    checked, positions = [], []
+    for position, record in enumerate(records):
+        response = record.get("response") or {}
+        intent = canonical_intent(response.get("intent"))
+        if intent is None:
+            logger.warning(f"Skipping example with unknown intent {response.get('intent')!r}: {record.get('query')}")
+            continue
+        if intent != response.get("intent"):
+            record = {**record, "response": {**response, "intent": intent}}
+        checked.append(record)
+        positions.append(position)
+    return checked, positions
+
+
+def record_key(record: dict) -> str:
+    return json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def create_index(vectors: np.ndarray, index_type: str):
+    """
+    Builds an inner-product index of the requested type over normalized vectors.
+    """
+    import faiss
+
+    count, dim = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif index_type == "ivfpq":
+        nlist = max(1, int(4 * math.sqrt(count)))
+        sub_quantizers = next(m for m in (64, 48, 32, 16, 8, 4, 2, 1) if dim % m == 0)
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, sub_quantizers, 8, faiss.METRIC_INNER_PRODUCT)
+        sample = vectors
+        if count > nlist * IVF_TRAIN_SAMPLE_PER_LIST:
+            rows = np.random.default_rng(0).choice(count, nlist * IVF_TRAIN_SAMPLE_PER_LIST, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+        index.nprobe = IVF_NPROBE
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    index.add(vectors)
+    if index_type == "ivfpq":
+        index.make_direct_map()  # keeps reconstruct_batch() working for MMR example selection
+    return index
+
+
+def index_type_of(index) -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+class IndexBuilder:
+    def __init__(self, store: str, directory: Path = None, encoder=None, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Builds and publishes versions of one RAG store. `encoder(texts)` must
+        return normalized float32 vectors; by default the retriever's
+        SentenceTransformer model is loaded on first use.
+        """
+        if store not in RAG_STORES and directory is None:
+            raise KeyError(f"Unknown RAG store: {store}")
+        self.store = store
+        self.directory = Path(directory or store_directory(store))
+        self.batch_size = batch_size
+        self._encoder = encoder
+        self._model = None
+
+    # ---- embedding ----
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embeds texts in batches of `batch_size`, logging progress for large corpora.
+        """
+        if self._encoder is None and self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+        chunks = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            if self._encoder is not None:
+                vectors = self._encoder(batch)
+            else:
+                vectors = self._model.encode(batch, batch_size=self.batch_size, normalize_embeddings=True)
+            chunks.append(np.asarray(vectors, dtype=np.float32))
+            if len(texts) > self.batch_size:
+                logger.info(f"Embedded {min(start + self.batch_size, len(texts))}/{len(texts)} examples")
+        if not chunks:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.concatenate(chunks))
+
+    # ---- publishing ----
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Serializes builders of the same store across processes.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(self.directory / ".build.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _publish(self, index, records: list, previous: dict, keep_versions: int) -> dict:
+        import faiss
+
+        version = previous.get("version", 0) + 1
+        index_name = f"faiss_index.v{version}.bin"
+        metadata_name = f"faiss_metadata.v{version}.jsonl"
+
+        data = faiss.serialize_index(index)
+        atomic_write(self.directory / index_name, lambda f: f.write(data.tobytes()))
+        write_metadata(self.directory / metadata_name, records)
+
+        manifest = {
+            "version": version,
+            "index": index_name,
+            "metadata": metadata_name,
+            "count": index.ntotal,
+            "dim": index.d,
+            "index_type": index_type_of(index),
+            "search_params": {"nprobe": IVF_NPROBE} if index_type_of(index) == "ivfpq" else {},
+            "model": EMBEDDING_MODEL_NAME,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        write_manifest(self.directory, manifest)
+        logger.info(f"Published RAG store '{self.store}' version {version}: {index.ntotal} vectors ({manifest['index_type']})")
+        self._prune(manifest, keep_versions)
+        return manifest
+
+    def _prune(self, manifest: dict, keep_versions: int):
+        """
+        Deletes versioned files older than the last `keep_versions` versions.
+        Servers still mapping them keep working (POSIX unlink semantics).
+        """
+        oldest_kept = manifest["version"] - keep_versions + 1
+        for path in self.directory.glob("faiss_*.v*.*"):
+            try:
+                file_version = int(path.name.split(".v", 1)[1].split(".", 1)[0])
+            except (IndexError, ValueError):
+                continue
+            if file_version < oldest_kept:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    logger.warning(f"Could not remove old store file {path.name}: {e}")
+
+    # ---- operations ----
+
+    def build(self, records: list, index_type: str = "auto", keep_versions: int = DEFAULT_KEEP_VERSIONS) -> dict:
+        """
+        Embeds all `records` (exact duplicates dropped) into a fresh index and publishes it.
+        """
+        records, _ = checked_positions(self.store, records)
+        records = list({record_key(record): record for record in records}.values())
+        if not records:
+            raise ValueError("No examples to index")
+
+        vectors = self.embed([example_text(record) for record in records])
+        chosen = choose_index_type(len(records)) if index_type == "auto" else index_type
+        index = create_index(vectors, chosen)
+        with self._locked():
+            return self._publish(index, records, read_manifest(self.directory), keep_versions)
+
+    def append(self, records: list, vectors: np.ndarray = None, index_type: str = "auto",
+               keep_versions: int = DEFAULT_KEEP_VERSIONS, superseded: list = None) -> dict | None:
+        """
+        Adds records that are not already in the current version; only those
+        are embedded (or taken from `vectors`, aligned with `records`). Stored
+        records equal to one in `superseded` (e.g. examples a correction
+        replaces) are dropped from the new version. Returns the new manifest,
+        or None when nothing changed.
+        """
+        records, positions = checked_positions(self.store, records)
+        if vectors is not None:
+            vectors = np.asarray(vectors, dtype=np.float32)[positions]
+        with self._locked():
+            previous = read_manifest(self.directory)
+            existing_records, index = self._load_current(previous)
+
+            dropped = {record_key(record) for record in superseded or ()}
+            kept_rows = [row for row, record in enumerate(existing_records) if record_key(record) not in dropped]
+
+            seen = {record_key(existing_records[row]) for row in kept_rows}
+            fresh_positions = []
+            for position, record in enumerate(records):
+                key = record_key(record)
+                if key not in seen:
+                    seen.add(key)
+                    fresh_positions.append(position)
+            if not fresh_positions and len(kept_rows) == len(existing_records):
+                logger.info(f"No new examples for RAG store '{self.store}'")
+                return None
+
+            fresh_records = [records[i] for i in fresh_positions]
+            if not fresh_records:
+                fresh_vectors = np.zeros((0, index.d), dtype=np.float32)
+            elif vectors is not None:
+                fresh_vectors = np.ascontiguousarray(vectors[fresh_positions])
+            else:
+                fresh_vectors = self.embed([example_text(record) for record in fresh_records])
+
+            total = len(kept_rows) + len(fresh_records)
+            target = choose_index_type(total) if index_type == "auto" else index_type
+            if target == index_type_of(index) and len(kept_rows) == index.ntotal:
+                index.add(fresh_vectors)
+            else:
+                # Crossing a size threshold or dropping rows: rebuild from the kept vectors plus the new ones
+                logger.info(f"Rebuilding RAG store '{self.store}' as {target} for {total} vectors")
+                old_vectors = index.reconstruct_batch(np.asarray(kept_rows, dtype=np.int64)) if kept_rows else fresh_vectors[:0]
+                index = create_index(np.concatenate([old_vectors, fresh_vectors]), target)
+
+            kept_records = [existing_records[row] for row in kept_rows]
+            return self._publish(index, kept_records + fresh_records, previous, keep_versions)
+
+    def _load_current(self, manifest: dict) -> tuple:
+        """
+        Reads the current version into private memory (it is about to be modified).
+        """
+        import faiss
+
+        index = faiss.read_index(str(self.directory / manifest["index"]))
+        metadata_path = self.directory / manifest["metadata"]
+        if metadata_path.suffix == ".json":
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        else:
+            records = list(MetadataStore(metadata_path))
+        if isinstance(index, faiss.IndexIVF):
+            index.make_direct_map()
+        return records, index
+
+
+def load_records(path: Path) -> list:
+    """
+    Reads examples from a JSON array file or a JSON-lines file.
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("build", "append"))
+    parser.add_argument("store", choices=sorted(RAG_STORES))
+    parser.add_argument("--source", type=Path, help="examples file (.json array or .jsonl); defaults to the store's few-shot file")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="auto")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--keep-versions", type=int, default=DEFAULT_KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    if args.command == "append" and args.source is None:
+        parser.error("append needs --source")
+
+    records = load_records(args.source or STORE_SOURCES[args.store])
+    builder = IndexBuilder(args.store, batch_size=args.batch_size)
+    start = time.perf_counter()
+    if args.command == "build":
+        manifest = builder.build(records, index_type=args.index_type, keep_versions=args.keep_versions)
+    else:
+        manifest = builder.append(records, index_type=args.index_type, keep_versions=args.keep_versions)
+    logger.info(f"Done in {time.perf_counter() - start:.1f}s: {json.dumps(manifest)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import threading
+import weakref
+from ingres_api.rag.example_selector import to_compact_example
+from ingres_api.utils.tokens import count_tokens
+
+RAG_HEADER = "**RAG-Retrieved Few-shot Examples:**"
+
+
+class PromptCompiler:
+    def __init__(self, system_prompt: str, prepare=None):
+        """
+        Lays out chat messages so the large static system prompt is a byte-identical
+        prefix on every call (eligible for provider-side prefix caching), with the
+        variable RAG block and the query last, in the user turn.
+
+        Rendered example fragments are memoized per RAG store by metadata index,
+        so building a prompt is a lookup instead of re-serializing JSON.
+        `prepare` optionally rewrites an example before it is rendered.
+        """
+        self.system_prompt = system_prompt
+        self.static_tokens = count_tokens(system_prompt)
+        self.header_tokens = count_tokens(RAG_HEADER)
+        self.prepare = prepare
+
+        # RagStore → {metadata index: (compact JSON, token count)}; entries vanish with the store
+        self._fragments = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+
+    def render_example(self, store, index: int) -> tuple:
+        """
+        Returns (compact JSON, token count) for one metadata entry of `store`.
+        """
+        with self._lock:
+            fragments = self._fragments.get(store)
+            if fragments is None:
+                fragments = self._fragments[store] = {}
+            cached = fragments.get(index)
+            if cached is not None:
+                self.fragment_hits += 1
+                return cached
+
+        example = store.metadata[index]
+        text = to_compact_example(self.prepare(example) if self.prepare else example)
+        rendered = (text, count_tokens(text))
+
+        with self._lock:
+            fragments[index] = rendered
+            self.fragment_misses += 1
+        return rendered
+
+    def build_messages(self, rag_text: str, user_prompt: str) -> list:
+        """
+        Static system prompt first; RAG examples and the per-request prompt last.
+        """
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"{RAG_HEADER}\n{rag_text}\n\n{user_prompt}"},
+        ]
+
+    def prompt_tokens(self, rag_tokens: int, user_prompt: str) -> int:
+        return self.static_tokens + self.header_tokens + rag_tokens + count_tokens(user_prompt)
+
+    def stats(self) -> dict:
+        return {
+            "static_prefix_tokens": self.static_tokens,
+            "fragment_hits": self.fragment_hits,
+            "fragment_misses": self.fragment_misses,
+        }
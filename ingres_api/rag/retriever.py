@@ -0,0 +1,281 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+from ingres_api.config import settings
+from ingres_api.utils.logger import logger
+from ingres_api.utils.metrics import stage
+from ingres_api.utils.text import normalize_query
+from ingres_api.utils.tokens import set_tokenizer
+from ingres_api.rag.embedding_batcher import EmbeddingBatcher
+from ingres_api.rag.embedding_cache import EmbeddingCache
+from ingres_api.rag.store_files import MetadataStore, read_manifest, seed_store
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Store names accepted by Retriever.retrieve()
+INTENT_STORE = "intent"
+NL_STORE = "nl"
+
+# Packaged store directories, resolved from the package so the working directory does not matter
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+RAG_STORES = {
+    INTENT_STORE: PACKAGE_DIR / "detect_intent" / "rag_store",
+    NL_STORE: PACKAGE_DIR / "natural_response" / "rag_store_nl",
+}
+
+
+def store_directory(name: str) -> Path:
+    """
+    Directory a store is served from and published to: RAG_DATA_DIR/<name>
+    (seeded from the packaged store on first use) when configured, else the
+    packaged, read-only directory.
+    """
+    if not settings.RAG_DATA_DIR:
+        return RAG_STORES[name]
+    directory = Path(settings.RAG_DATA_DIR) / name
+    seed_store(RAG_STORES[name], directory)
+    return directory
+
+
+@dataclass
+class RetrievalResult:
+    """
+    Neighbours returned for one query, plus the query embedding so the
+    caller can reuse it for another store without re-encoding.
+    """
+    examples: list
+    scores: list
+    indices: list
+    query_vector: np.ndarray
+    store: "RagStore" = None  # the store version the indices refer to
+
+
+def read_index(path: Path):
+    """
+    Opens a FAISS index memory-mapped and read-only, so every worker process
+    shares one page-cache copy; falls back to a private read for index types
+    that cannot be mapped.
+    """
+    import faiss  # deferred so importing the API does not pay for the native library
+
+    # Flat-code mapping (flat/HNSW storage) where available, else the generic mmap flag
+    mmap_flags = [faiss.IO_FLAG_MMAP]
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        mmap_flags.insert(0, faiss.IO_FLAG_MMAP_IFC)
+    for flag in mmap_flags:
+        try:
+            return faiss.read_index(str(path), flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            error = e
+    logger.warning(f"Could not memory-map {path.name} ({error}); reading it into memory")
+    return faiss.read_index(str(path))
+
+
+class RagStore:
+    def __init__(self, directory: Path):
+        """
+        Opens the store version named by the directory's manifest: a
+        memory-mapped FAISS index plus offset-indexed JSON-lines metadata.
+        """
+        self.directory = Path(directory)
+        self.manifest = read_manifest(self.directory)
+        self.version = self.manifest.get("version", 0)
+
+        self.index_file = self.directory / self.manifest["index"]
+        self.metadata_file = self.directory / self.manifest["metadata"]
+        self.index = read_index(self.index_file)
+        # Search-time knobs that FAISS does not serialize (e.g. nprobe for IVF)
+        for name, value in self.manifest.get("search_params", {}).items():
+            setattr(self.index, name, value)
+        if self.metadata_file.suffix == ".json":
+            # Legacy single-array metadata
+            with open(self.metadata_file, "r", encoding="utf-8") as f:
+                self.metadata = json.load(f)
+        else:
+            self.metadata = MetadataStore(self.metadata_file)
+
+    def vectors(self, indices: list) -> np.ndarray:
+        """
+        Returns the stored (normalized) embeddings for the given row indices.
+        """
+        return self.index.reconstruct_batch(np.asarray(indices, dtype=np.int64))
+
+    def search(self, query_vectors: np.ndarray, k: int) -> list:
+        """
+        Searches a (n, dim) batch of query vectors.
+        Returns one (examples, scores, indices) tuple per query row.
+        """
+        distances, indices = self.index.search(query_vectors, k)
+
+        results = []
+        for row_indices, row_scores in zip(indices, distances):
+            examples, scores, kept = [], [], []
+            for idx, score in zip(row_indices, row_scores):
+                if idx == -1:
+                    continue
+                examples.append(self.metadata[idx])
+                scores.append(float(score))
+                kept.append(int(idx))
+            results.append((examples, scores, kept))
+        return results
+
+
+class Retriever:
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        """
+        Loads the sentence encoder once and every RAG store it serves.
+        """
+        # Deferred: pulls in torch/transformers, which dominates import time
+        from sentence_transformers import SentenceTransformer
+
+        self.embedding_model = SentenceTransformer(model_name)
+        set_tokenizer(self.embedding_model.tokenizer)
+        self.embedding_cache = EmbeddingCache(
+            model_name,
+            max_entries=settings.EMBED_CACHE_SIZE,
+            disk_path=settings.EMBED_CACHE_PATH,
+        )
+        self.stores = {name: RagStore(store_directory(name)) for name in RAG_STORES}
+        self._reload_lock = threading.Lock()
+
+        # Concurrent async lookups are coalesced into batched encode/search calls
+        self.batcher = None
+        if settings.EMBED_BATCH_WINDOW_MS > 0:
+            self.batcher = EmbeddingBatcher(
+                self.retrieve_batch,
+                window_ms=settings.EMBED_BATCH_WINDOW_MS,
+                max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+            )
+        logger.info(f"Retriever ready with stores: {', '.join(self.stores)}")
+
+    def encode(self, queries: list) -> np.ndarray:
+        """
+        Embeds a list of queries into a normalized float32 (n, dim) array.
+        Queries are keyed by their normalized text; cached vectors are reused
+        and only distinct misses go through the model.
+        """
+        keys = [normalize_query(query) for query in queries]
+        vectors = self.embedding_cache.get_many(keys)
+
+        missing_keys = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing_keys:
+            encoded = self.embedding_model.encode(missing_keys, normalize_embeddings=True)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            self.embedding_cache.put_many(missing_keys, encoded)
+            fresh = dict(zip(missing_keys, encoded))
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def retrieve_batch(self, requests: list) -> list:
+        """
+        Serves a list of (store, query, k, query_vector) requests with a single
+        encode call for all missing vectors and one FAISS search per store.
+        Returns one RetrievalResult per request, in order.
+        """
+        for store, _, _, _ in requests:
+            if store not in self.stores:
+                raise KeyError(f"Unknown RAG store: {store}")
+
+        vectors = [query_vector for _, _, _, query_vector in requests]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            with stage("retriever", "encode"):
+                encoded = self.encode([requests[i][1] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+
+        by_store = defaultdict(list)
+        for i, (store, _, _, _) in enumerate(requests):
+            by_store[store].append(i)
+
+        results = [None] * len(requests)
+        for store, positions in by_store.items():
+            # One snapshot per group: a concurrent hot swap never mixes versions in a result
+            rag_store = self.stores[store]
+            k = max(requests[i][2] for i in positions)
+            batch = np.stack([vectors[i] for i in positions]).astype(np.float32, copy=False)
+            with stage("retriever", f"search_{store}"):
+                rows = rag_store.search(batch, k)
+            for i, (examples, scores, indices) in zip(positions, rows):
+                k_i = requests[i][2]
+                results[i] = RetrievalResult(
+                    examples=examples[:k_i],
+                    scores=scores[:k_i],
+                    indices=indices[:k_i],
+                    query_vector=vectors[i],
+                    store=rag_store,
+                )
+        return results
+
+    def retrieve(self, store: str, query: str, k: int = 5, query_vector: np.ndarray = None) -> RetrievalResult:
+        """
+        Returns the top-k examples from `store` for `query`.
+        Pass `query_vector` from an earlier RetrievalResult to skip encoding.
+        """
+        return self.retrieve_batch([(store, query, k, query_vector)])[0]
+
+    async def aretrieve(self, store: str, query: str, k: int = 5, query_vector: np.ndarray = None) -> RetrievalResult:
+        """
+        Async variant of retrieve(). Requests are micro-batched with other
+        in-flight lookups when batching is enabled; the CPU work always runs
+        in a worker thread.
+        """
+        if self.batcher is not None:
+            return await self.batcher.submit(store, query, k, query_vector)
+        return await asyncio.to_thread(self.retrieve, store, query, k, query_vector)
+
+
+    def reload(self, names: list = None) -> list:
+        """
+        Swaps in any store whose manifest names a newer version and returns
+        the names that changed. The new version is fully opened before the
+        swap; requests already holding the old store finish against it.
+        """
+        swapped = []
+        with self._reload_lock:
+            for name in names or list(self.stores):
+                current = self.stores[name]
+                manifest = read_manifest(current.directory)
+                if manifest.get("version", 0) == current.version:
+                    continue
+                try:
+                    fresh = RagStore(current.directory)
+                except Exception as e:
+                    logger.error(f"Could not load version {manifest.get('version')} of RAG store '{name}': {e}")
+                    continue
+                if fresh.index.d != current.index.d:
+                    logger.error(f"Refusing to swap RAG store '{name}': dimension {fresh.index.d} != {current.index.d}")
+                    continue
+                self.stores[name] = fresh
+                swapped.append(name)
+                logger.info(f"RAG store '{name}' swapped to version {fresh.version} ({fresh.index.ntotal} vectors)")
+        return swapped
+
+    async def watch(self, interval_seconds: float):
+        """
+        Polls the store manifests and hot-swaps new versions (started from the app lifespan).
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.error(f"RAG store reload check failed: {e}")
+
+
+_retriever: Retriever | None = None
+
+
+def get_retriever() -> Retriever:
+    """
+    Returns the process-wide Retriever, loading the encoder on first use.
+    """
+    global _retriever
+    if _retriever is None:
+        _retriever = Retriever()
+    return _retriever
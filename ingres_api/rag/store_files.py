@@ -0,0 +1,128 @@
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+
+# Unversioned file names used when a store directory has no manifest yet
+DEFAULT_INDEX_FILE = "faiss_index.bin"
+DEFAULT_METADATA_FILE = "faiss_metadata.jsonl"
+
+
+def offsets_file(metadata_path: Path) -> Path:
+    return metadata_path.with_suffix(".idx")
+
+
+def atomic_write(path: Path, write):
+    """
+    Calls `write(file)` on a temp file in the same directory, fsyncs it and
+    renames it over `path`, so readers only ever see a complete file.
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_name, 0o644)  # mkstemp creates 0600; other worker users must be able to read
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def write_metadata(path: Path, records: list):
+    """
+    Writes records as compact JSON lines plus a uint64 offsets sidecar (.idx)
+    holding the byte offset of every line and the final file size.
+    """
+    lines = [json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n" for record in records]
+    offsets = np.zeros(len(lines) + 1, dtype=np.uint64)
+    if lines:
+        offsets[1:] = np.cumsum([len(line) for line in lines], dtype=np.uint64)
+
+    atomic_write(path, lambda f: f.writelines(lines))
+    atomic_write(offsets_file(path), lambda f: f.write(offsets.tobytes()))
+
+
+class MetadataStore:
+    def __init__(self, path: Path):
+        """
+        Read-only, memory-mapped view of a JSON-lines metadata file. Records
+        are decoded on access, so every worker shares the OS page cache
+        instead of holding its own parsed copy of the whole list.
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        sidecar = offsets_file(self.path)
+        if sidecar.exists():
+            self._offsets = np.memmap(sidecar, dtype=np.uint64, mode="r")
+        else:
+            # No sidecar: derive line offsets with one vectorized newline scan
+            ends = np.flatnonzero(np.frombuffer(self._data, dtype=np.uint8) == 10) + 1 if size else np.array([], dtype=np.int64)
+            self._offsets = np.concatenate(([0], ends)).astype(np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return json.loads(self._data[start:end])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def read_manifest(directory: Path) -> dict:
+    """
+    Returns the store manifest ({"version", "index", "metadata", ...}),
+    or the unversioned defaults when the directory has none.
+    """
+    manifest_path = Path(directory) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return {"version": 0, "index": DEFAULT_INDEX_FILE, "metadata": DEFAULT_METADATA_FILE}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(directory: Path, manifest: dict):
+    """
+    Publishes a new store version. The manifest is the only file readers
+    check, and it is replaced atomically after the files it names exist.
+    """
+    data = json.dumps(manifest, indent=2).encode("utf-8")
+    atomic_write(Path(directory) / MANIFEST_FILE, lambda f: f.write(data))
+
+
+def seed_store(source: Path, target: Path):
+    """
+    Copies the current version of the store in `source` to `target` unless
+    `target` already has a manifest. The manifest is written last, so an
+    interrupted seed is simply redone on the next start.
+    """
+    source, target = Path(source), Path(target)
+    if (target / MANIFEST_FILE).exists():
+        return
+    target.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(source)
+    names = [manifest["index"], manifest["metadata"], offsets_file(Path(manifest["metadata"])).name]
+    for name in names:
+        if not (source / name).exists():  # e.g. no .idx sidecar for legacy .json metadata
+            continue
+        with open(source / name, "rb") as src:
+            atomic_write(target / name, lambda f: shutil.copyfileobj(src, f))
+    write_manifest(target, manifest)
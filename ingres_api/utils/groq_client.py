@@ -0,0 +1,104 @@
+import json
+import groq
+import httpx
+from ingres_api.config import settings
+from ingres_api.utils.logger import logger
+from ingres_api.utils.json_repair import loads_lenient
+from ingres_api.utils.metrics import stage
+
+_async_clients: dict[int, groq.AsyncGroq] = {}
+
+
+def api_keys() -> list[str]:
+    """
+    All configured Groq API keys: GROQ_API_KEY first, then any extra GROQ_API_KEYS.
+    """
+    keys = [settings.GROQ_API_KEY] + list(settings.GROQ_API_KEYS)
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def get_async_client(key_index: int = 0) -> groq.AsyncGroq:
+    """
+    Returns the process-wide AsyncGroq client for the given API key.
+    All callers share one pooled, keep-alive HTTP connection pool per key so
+    concurrent chats reuse TLS connections instead of opening a new one per request.
+    """
+    client = _async_clients.get(key_index)
+    if client is None:
+        keys = api_keys()
+        if not keys:
+            raise ValueError("No Groq API key: set GROQ_API_KEY or GROQ_API_KEYS in your .env file.")
+
+        http_client = groq.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY,
+            )
+        )
+        # Retries, deadlines and backoff are handled by ResilientLLM, not the SDK
+        client = groq.AsyncGroq(api_key=keys[key_index], http_client=http_client, max_retries=0)
+        _async_clients[key_index] = client
+    return client
+
+
+async def close_async_client():
+    """
+    Closes the shared clients and their connection pools (called on shutdown).
+    """
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.close()
+
+
+def failed_generation(error: Exception) -> str | None:
+    """
+    Returns the raw completion Groq attaches to a JSON-mode validation failure
+    (400 json_validate_failed), so it can be repaired locally instead of re-requested.
+    """
+    if not isinstance(error, groq.BadRequestError) or not isinstance(error.body, dict):
+        return None
+    details = error.body.get("error", error.body)
+    if not isinstance(details, dict):
+        return None
+    return details.get("failed_generation")
+
+
+async def complete_json(llm, component: str, schema, model: str, messages: list, **kwargs) -> dict:
+    """
+    One JSON-mode completion on `model` through `llm`, validated against the
+    pydantic `schema`. Malformed output goes through a local repair pass before
+    it is rejected. Raises json.JSONDecodeError when the output is empty or
+    cannot be repaired, and pydantic.ValidationError when it is outside the schema.
+    """
+    try:
+        with stage(component, "llm"):
+            response = await llm.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                **kwargs,
+            )
+    except groq.BadRequestError as e:
+        # JSON mode rejects malformed generations with a 400 that still carries the text
+        output = failed_generation(e)
+        if output is None:
+            raise
+        logger.warning(f"Groq JSON validation failed ({model}); repairing locally")
+    else:
+        if not response or not response.choices:
+            logger.error(f"Empty response from Groq model {model}.")
+            output = ""
+        else:
+            output = response.choices[0].message.content or ""
+
+    logger.info(f"Raw Groq response ({model}): {output}")
+
+    with stage(component, "parse"):
+        try:
+            parsed = loads_lenient(output)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse Groq response as JSON ({model}): {e}. Output: {output}")
+            raise
+        return schema.model_validate(parsed).model_dump()
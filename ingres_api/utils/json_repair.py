@@ -0,0 +1,93 @@
+import json
+import re
+
+_CODE_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+_DANGLING_COMMA = re.compile(r",\s*$")
+_DANGLING_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*(?::\s*)?$')
+
+
+def _extract_object(text: str) -> str:
+    """
+    Returns the first top-level JSON object in `text`, dropping prose around it.
+    A truncated object is returned up to the end of the text.
+    """
+    start = text.find("{")
+    if start == -1:
+        return text
+
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Closes an unterminated string and any brackets left open by a cut-off completion.
+    """
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+
+    # A dangling separator, or an object key with no value yet, cannot be completed; drop it
+    text = _DANGLING_COMMA.sub("", text)
+    if stack and stack[-1] == "}":
+        text = _DANGLING_KEY.sub(r"\1", text)
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort local fix-up of a model completion into parseable JSON:
+    strips code fences and surrounding prose, removes trailing commas and
+    closes braces/strings left open by truncation.
+    """
+    cleaned = _CODE_FENCE.sub("", text or "").strip()
+    cleaned = _extract_object(cleaned)
+    cleaned = _TRAILING_COMMA.sub(r"\1", cleaned)
+    cleaned = _close_truncated(cleaned)
+    return _TRAILING_COMMA.sub(r"\1", cleaned)
+
+
+def loads_lenient(text: str):
+    """
+    json.loads with a local repair pass on failure.
+    Raises json.JSONDecodeError only when the repaired text is still invalid.
+    """
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return json.loads(repair_json(text))
@@ -0,0 +1,232 @@
+import contextvars
+import math
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from ingres_api.utils.logger import logger
+
+# Seconds; covers sub-millisecond FAISS searches up to slow Groq completions
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        Monotonic counter with one series per label combination.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        """
+        Cumulative-bucket histogram with one series per label combination.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if position < len(self.buckets):
+                series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+def render_gauges(prefix: str, stats: dict) -> list:
+    """
+    Flattens nested component stats() dicts into gauges named
+    `<prefix>_<component>_<key>`; non-numeric values are skipped.
+    """
+    lines = []
+
+    def walk(name: str, value):
+        if isinstance(value, dict):
+            for key, inner in value.items():
+                walk(f"{name}_{key}", inner)
+        elif isinstance(value, (list, tuple)):
+            for position, inner in enumerate(value):
+                walk(f"{name}_{position}", inner)
+        elif isinstance(value, (int, float)):  # bools count as 0/1
+            metric = _INVALID_NAME_CHARS.sub("_", name)
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_format_value(float(value))}")
+
+    for component, component_stats in stats.items():
+        walk(f"{prefix}_{component}", component_stats)
+    return lines
+
+
+# ---- metrics recorded on the hot path ----
+
+REQUEST_SECONDS = Histogram(
+    "ingres_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "ingres_stage_duration_seconds", "Latency of one processing stage.", ("component", "stage"),
+)
+LLM_SECONDS = Histogram(
+    "ingres_llm_request_duration_seconds", "Latency of single Groq requests.", ("model", "outcome"),
+)
+LLM_TOKENS = Counter(
+    "ingres_llm_tokens_total", "Tokens reported in the Groq usage field.", ("model", "kind"),
+)
+ERRORS = Counter(
+    "ingres_errors_total", "Errors by component and exception type.", ("component", "type"),
+)
+
+METRICS = (REQUEST_SECONDS, STAGE_SECONDS, LLM_SECONDS, LLM_TOKENS, ERRORS)
+
+
+def render_metrics(component_stats: dict) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(render_gauges("ingres", component_stats))
+    return "\n".join(lines) + "\n"
+
+
+def record_error(component: str, error: BaseException):
+    ERRORS.inc(component=component, type=type(error).__name__)
+
+
+def record_usage(model: str, usage):
+    """
+    Counts prompt/completion tokens from a Groq `usage` object (ignored when None).
+    """
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+
+
+# ---- per-request traces ----
+
+class RequestTrace:
+    def __init__(self, request_id: str | None = None):
+        """
+        Stage timings of one request, logged under its id when the request ends.
+        """
+        self.request_id = request_id
+        self.stages = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] += seconds
+
+    def summary(self) -> str:
+        with self._lock:
+            return ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.stages.items())
+
+
+current_trace = contextvars.ContextVar("request_trace", default=None)
+
+
+@contextmanager
+def trace_scope(request_id: str | None = None):
+    """
+    Starts a trace for the enclosed work (one HTTP request or one batch item).
+    """
+    trace = RequestTrace(request_id)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+def set_request_id(request_id: str | None) -> str:
+    """
+    Tags the current trace with the client's uuid, or a generated one when it sent none.
+    """
+    request_id = request_id or uuid.uuid4().hex
+    trace = current_trace.get()
+    if trace is not None:
+        trace.request_id = request_id
+    return request_id
+
+
+def log_trace(trace: RequestTrace, label: str):
+    if trace.request_id and trace.stages:
+        logger.info(f"Trace {trace.request_id} {label}: {trace.summary()}")
+
+
+@contextmanager
+def stage(component: str, name: str):
+    """
+    Times the enclosed block into STAGE_SECONDS and the current request trace.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, component=component, stage=name)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(f"{component}.{name}", elapsed)
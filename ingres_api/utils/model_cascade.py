@@ -0,0 +1,80 @@
+import json
+import time
+from collections import defaultdict
+from ingres_api.utils.logger import logger
+
+
+class ModelCascade:
+    def __init__(self, name: str, fast_model: str, strong_model: str | None):
+        """
+        Tries the fast model first and re-runs the same request on the strong
+        model only when the fast answer is rejected (invalid JSON, or whatever
+        the caller's `escalation_reason` flags). Keeps per-route latency and
+        escalation-rate counters.
+        """
+        self.name = name
+        self.fast_model = fast_model
+        self.strong_model = strong_model if strong_model and strong_model != fast_model else None
+
+        self.calls = 0
+        self.escalations = defaultdict(int)
+        self.route_calls = defaultdict(int)
+        self.route_latency_ms = defaultdict(float)
+
+    def _record(self, route: str, start: float):
+        self.route_calls[route] += 1
+        self.route_latency_ms[route] += (time.perf_counter() - start) * 1000
+
+    async def run(self, attempt, escalation_reason):
+        """
+        `attempt(model)` performs one LLM call and returns the parsed result,
+        raising json.JSONDecodeError when the output is not JSON, or another
+        ValueError (e.g. pydantic.ValidationError) when it breaks the schema.
+        `escalation_reason(result)` returns a reason string, or None to accept.
+        """
+        self.calls += 1
+        start = time.perf_counter()
+        fast_result, fast_error = None, None
+        try:
+            fast_result = await attempt(self.fast_model)
+            reason = escalation_reason(fast_result)
+        except json.JSONDecodeError as e:
+            fast_error, reason = e, "invalid_json"
+        except ValueError as e:
+            fast_error, reason = e, "schema_violation"
+        self._record("fast", start)
+
+        if reason is None or self.strong_model is None:
+            if fast_error is not None:
+                raise fast_error
+            return fast_result
+
+        self.escalations[reason] += 1
+        logger.info(f"{self.name}: escalating to {self.strong_model} ({reason})")
+
+        start = time.perf_counter()
+        try:
+            return await attempt(self.strong_model)
+        except Exception as e:
+            # Keep the usable fast answer if the strong model fails outright
+            if fast_result is None:
+                raise
+            logger.warning(f"{self.name}: strong model failed ({e}); using fast model answer")
+            return fast_result
+        finally:
+            self._record("strong", start)
+
+    def stats(self) -> dict:
+        escalated = sum(self.escalations.values())
+        return {
+            "calls": self.calls,
+            "escalations": dict(self.escalations),
+            "escalation_rate": (escalated / self.calls) if self.calls else 0.0,
+            "routes": {
+                route: {
+                    "calls": count,
+                    "avg_latency_ms": self.route_latency_ms[route] / count,
+                }
+                for route, count in self.route_calls.items()
+            },
+        }
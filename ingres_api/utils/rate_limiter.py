@@ -0,0 +1,287 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from ingres_api.config import settings
+from ingres_api.utils.logger import logger
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_WARMUP = 2
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch", PRIORITY_WARMUP: "warmup"}
+
+# Priority applied to Groq calls made in the current task unless a call overrides it
+current_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+# Longest sleep of the queue pump between capacity checks
+MAX_PUMP_SLEEP = 1.0
+
+
+@contextmanager
+def priority_scope(priority: int):
+    """
+    Runs the enclosed Groq calls (including nested ones) at `priority`.
+    """
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def estimate_request_tokens(messages: list, max_tokens: int | None) -> int:
+    """
+    Prompt tokens (~4 characters per token plus per-message overhead) plus the
+    completion allowance, which is what Groq counts against the TPM limit.
+    """
+    prompt = sum(len(str(m.get("content") or "")) // 4 + 4 for m in messages)
+    return prompt + (max_tokens or 0)
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a call cannot get Groq capacity within its priority's queue wait.
+    `retry_after` is the estimated number of seconds until capacity frees up.
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(f"Groq rate limit budget exhausted; retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        """
+        Classic token bucket holding up to one minute of budget, refilled continuously.
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class KeyBudget:
+    def __init__(self, index: int, rpm: int, tpm: int):
+        """
+        Request and token buckets for one model on one Groq API key.
+        """
+        self.index = index
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        return max(
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(tokens, now),
+            self.blocked_until - now,
+        )
+
+    def headroom(self) -> float:
+        """
+        Fraction of the tighter bucket still available; used to spread load across keys.
+        """
+        return min(self.requests.tokens / self.requests.capacity, self.tokens.tokens / self.tokens.capacity)
+
+
+class RateLimiter:
+    def __init__(self, key_count: int, rpm: int, tpm: int, max_wait: dict):
+        """
+        Token-bucket scheduler in front of all Groq calls. Groq limits each
+        model separately per API key, so every (key, model) pair has its own
+        RPM and TPM buckets; a call takes capacity from the key with the most
+        headroom for its model. When no key has room, calls queue in priority
+        order and are shed with RateLimitExceeded if the estimated wait exceeds
+        their priority's `max_wait` seconds.
+        """
+        self.key_count = max(key_count, 1)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.models = {}  # model -> [KeyBudget per API key]
+        self.max_wait = max_wait
+
+        self._queue = []  # (priority, sequence, model, tokens, future)
+        self._sequence = itertools.count()
+        self._pump_task = None
+
+        self.granted = defaultdict(int)
+        self.queued = defaultdict(int)
+        self.shed = defaultdict(int)
+        self.upstream_limited = 0
+
+    @classmethod
+    def from_settings(cls, key_count: int) -> "RateLimiter":
+        """
+        The configured limits are what Groq allows per key and model; every one
+        of the GROQ_LIMIT_WORKERS processes sharing the keys gets an equal share.
+        """
+        workers = max(settings.GROQ_LIMIT_WORKERS, 1)
+        return cls(
+            key_count=key_count,
+            rpm=max(settings.GROQ_RPM_LIMIT // workers, 1),
+            tpm=max(settings.GROQ_TPM_LIMIT // workers, 1),
+            max_wait={
+                PRIORITY_INTERACTIVE: settings.LLM_QUEUE_MAX_WAIT_INTERACTIVE,
+                PRIORITY_BATCH: settings.LLM_QUEUE_MAX_WAIT_BATCH,
+                PRIORITY_WARMUP: settings.LLM_QUEUE_MAX_WAIT_WARMUP,
+            },
+        )
+
+    def _keys(self, model: str) -> list:
+        keys = self.models.get(model)
+        if keys is None:
+            keys = self.models[model] = [KeyBudget(i, self.rpm, self.tpm) for i in range(self.key_count)]
+        return keys
+
+    def _waiting(self, model: str, priority: int = None):
+        return [
+            entry for entry in self._queue
+            if entry[2] == model and not entry[4].done() and (priority is None or entry[0] <= priority)
+        ]
+
+    def _try_take(self, model: str, tokens: int, now: float) -> int | None:
+        ready = [key for key in self._keys(model) if key.wait_time(tokens, now) == 0.0]
+        if not ready:
+            return None
+        key = max(ready, key=KeyBudget.headroom)
+        key.requests.take(1)
+        key.tokens.take(tokens)
+        return key.index
+
+    def _estimated_wait(self, model: str, tokens: int, priority: int, now: float) -> float:
+        """
+        Time until this call could start: its own bucket wait on the best key,
+        plus the aggregate refill time for calls to the same model of equal or
+        higher priority ahead of it.
+        """
+        keys = self._keys(model)
+        own = min(key.wait_time(tokens, now) for key in keys)
+        ahead = self._waiting(model, priority)
+        if not ahead:
+            return own
+        token_rate = sum(key.tokens.rate for key in keys)
+        request_rate = sum(key.requests.rate for key in keys)
+        backlog = max(sum(entry[3] for entry in ahead) / token_rate, len(ahead) / request_rate)
+        return own + backlog
+
+    async def acquire(self, model: str, tokens: int, priority: int = None) -> int:
+        """
+        Reserves capacity for one call to `model` estimated at `tokens` TPM
+        tokens and returns the index of the API key to use.
+        Raises RateLimitExceeded when the call would wait longer than allowed.
+        """
+        priority = current_priority.get() if priority is None else priority
+        now = time.monotonic()
+
+        if not self._waiting(model, priority):
+            key = self._try_take(model, tokens, now)
+            if key is not None:
+                self.granted[priority] += 1
+                return key
+
+        max_wait = self.max_wait.get(priority, 0.0)
+        wait = self._estimated_wait(model, tokens, priority, now)
+        if wait > max_wait:
+            self.shed[priority] += 1
+            raise RateLimitExceeded(retry_after=max(wait, 1.0))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), model, tokens, future))
+        self.queued[priority] += 1
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+
+        try:
+            key = await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            self.shed[priority] += 1
+            retry_after = self._estimated_wait(model, tokens, priority, time.monotonic())
+            raise RateLimitExceeded(retry_after=max(retry_after, 1.0))
+        self.granted[priority] += 1
+        return key
+
+    def try_acquire(self, model: str, tokens: int) -> int | None:
+        """
+        Non-waiting acquire for optional work (e.g. hedged duplicates):
+        returns a key index only if capacity is free right now and nobody is queued for the model.
+        """
+        if self._waiting(model):
+            return None
+        return self._try_take(model, tokens, time.monotonic())
+
+    async def _pump(self):
+        """
+        Grants queued calls in priority order as buckets refill. A model whose
+        buckets are empty does not hold up calls queued for other models.
+        """
+        while True:
+            self._queue = [entry for entry in self._queue if not entry[4].done()]  # timed out or cancelled
+            heapq.heapify(self._queue)
+            if not self._queue:
+                return
+            now = time.monotonic()
+            blocked = {}
+            for priority, sequence, model, tokens, future in sorted(self._queue):
+                if model in blocked:
+                    continue
+                key = self._try_take(model, tokens, now)
+                if key is None:
+                    blocked[model] = min(budget.wait_time(tokens, now) for budget in self._keys(model))
+                else:
+                    future.set_result(key)
+            if blocked:  # everything still queued waits on a blocked model
+                await asyncio.sleep(min(max(min(blocked.values()), 0.01), MAX_PUMP_SLEEP))
+
+    def settle(self, model: str, key_index: int, estimated: int, actual: int | None):
+        """
+        Corrects a key's TPM bucket for `model` once the real usage of a call is known.
+        """
+        if actual is None:
+            return
+        bucket = self._keys(model)[key_index].tokens
+        if actual < estimated:
+            bucket.give(estimated - actual)
+        else:
+            bucket.take(actual - estimated)
+
+    def penalize(self, model: str, key_index: int, seconds: float):
+        """
+        Groq itself answered 429 for `model` on this key: hold it back for `seconds`.
+        """
+        self.upstream_limited += 1
+        key = self._keys(model)[key_index]
+        key.blocked_until = max(key.blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Groq key #{key_index} rate limited upstream for {model}; pausing it for {seconds:.1f}s")
+
+    def stats(self) -> dict:
+        return {
+            "keys": self.key_count,
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "queue_depth": sum(1 for entry in self._queue if not entry[4].done()),
+            "granted": {PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+            "queued": {PRIORITY_NAMES[p]: n for p, n in self.queued.items()},
+            "shed": {PRIORITY_NAMES[p]: n for p, n in self.shed.items()},
+            "upstream_limited": self.upstream_limited,
+            "headroom": {model: [round(key.headroom(), 3) for key in keys] for model, keys in self.models.items()},
+        }
@@ -0,0 +1,378 @@
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from email.utils import parsedate_to_datetime
+
+import groq
+from ingres_api.config import settings
+from ingres_api.utils.logger import logger
+from ingres_api.utils.groq_client import api_keys, get_async_client
+from ingres_api.utils.metrics import LLM_SECONDS, record_error, record_usage
+from ingres_api.utils.rate_limiter import RateLimiter, RateLimitExceeded, estimate_request_tokens
+
+# Upstream failures worth another attempt; anything else (e.g. a 400) is final
+RETRYABLE_ERRORS = (groq.RateLimitError, groq.InternalServerError, groq.APIConnectionError)
+
+# Successful call latencies kept per model for the hedging delay
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling Groq while the circuit breaker is open.
+    """
+
+
+class LLMDeadlineExceeded(asyncio.TimeoutError):
+    """
+    Raised when a call (including its retries) does not finish within its deadline.
+    """
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        """
+        Opens after `failure_threshold` consecutive failed calls and rejects
+        calls for `reset_seconds`; then lets a single probe through (half-open)
+        whose outcome closes or re-opens the circuit.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        if self.state != "closed":
+            logger.info("LLM circuit breaker closed")
+        self.state = "closed"
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+                logger.warning(f"LLM circuit breaker opened after {self.consecutive_failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
+
+
+class ResilientLLM:
+    def __init__(
+        self,
+        deadline_seconds: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        hedge_enabled: bool,
+        hedge_min_samples: int,
+        hedge_min_delay: float,
+        breaker: CircuitBreaker,
+        limiter: RateLimiter | None = None,
+    ):
+        """
+        Wraps `chat.completions.create` on the shared AsyncGroq client with
+        a per-call deadline, jittered exponential backoff on 429/5xx and
+        connection errors (honouring Retry-After), an optional hedged duplicate
+        request once a call outlives the model's recent p95 latency, and a
+        circuit breaker that fails fast while Groq is unhealthy. With a
+        `limiter`, every request first takes RPM/TPM capacity for its model from
+        one of the configured API keys.
+        """
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker
+        self.limiter = limiter
+
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    @classmethod
+    def from_settings(cls) -> "ResilientLLM":
+        return cls(
+            deadline_seconds=settings.LLM_DEADLINE_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+            hedge_enabled=settings.LLM_HEDGE_ENABLED,
+            hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+            hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                reset_seconds=settings.LLM_BREAKER_RESET_SECONDS,
+            ),
+            # Client-side rate limiting is off unless both Groq limits are configured
+            limiter=(
+                RateLimiter.from_settings(key_count=len(api_keys()))
+                if settings.GROQ_RPM_LIMIT > 0 and settings.GROQ_TPM_LIMIT > 0 else None
+            ),
+        )
+
+    def _hedge_delay(self, model: str) -> float | None:
+        samples = self.latencies[model]
+        if not self.hedge_enabled or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return max(p95, self.hedge_min_delay)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float | None:
+        """
+        Seconds from the Retry-After / retry-after-ms headers of an error response, if any.
+        """
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after_ms = headers.get("retry-after-ms")
+        retry_after = headers.get("retry-after")
+        try:
+            if retry_after_ms is not None:
+                return float(retry_after_ms) / 1000
+            if retry_after is not None:
+                return float(retry_after)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+        return None
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Server-provided Retry-After when present, else full-jitter exponential backoff.
+        """
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _timed(self, kwargs: dict, key_index: int, tokens: int):
+        start = time.perf_counter()
+        model = kwargs.get("model")
+        try:
+            response = await get_async_client(key_index).chat.completions.create(**kwargs)
+        except Exception as e:
+            LLM_SECONDS.observe(time.perf_counter() - start, model=model, outcome=type(e).__name__)
+            self._release_capacity(e, model, key_index, tokens)
+            raise
+        if not kwargs.get("stream"):
+            elapsed = time.perf_counter() - start
+            self.latencies[model].append(elapsed)
+            LLM_SECONDS.observe(elapsed, model=model, outcome="ok")
+            usage = getattr(response, "usage", None)
+            record_usage(model, usage)
+            if self.limiter is not None:
+                self.limiter.settle(model, key_index, tokens, getattr(usage, "total_tokens", None))
+        return response
+
+    def _release_capacity(self, error: Exception, model: str, key_index: int, tokens: int):
+        """
+        Adjusts the key's budget after a failed request.
+        """
+        if self.limiter is None:
+            return
+        if isinstance(error, groq.RateLimitError):
+            self.limiter.penalize(model, key_index, self._retry_after(error) or self.backoff_max)
+        elif isinstance(error, groq.APIConnectionError):
+            # The request never reached Groq, so it consumed none of the key's TPM budget
+            self.limiter.settle(model, key_index, tokens, 0)
+
+    async def _attempt(self, kwargs: dict, hedge: bool, key_index: int, tokens: int):
+        """
+        One logical attempt; with hedging, a duplicate request is raced against
+        the first one once it outlives the recent p95 latency (and only if a key
+        has spare capacity for it right now).
+        """
+        delay = self._hedge_delay(kwargs.get("model")) if hedge and not kwargs.get("stream") else None
+        if delay is None:
+            return await self._timed(kwargs, key_index, tokens)
+
+        primary = asyncio.create_task(self._timed(kwargs, key_index, tokens))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            hedge_key = None
+            if not done:
+                hedge_key = self.limiter.try_acquire(kwargs.get("model"), tokens) if self.limiter is not None else key_index
+            if hedge_key is not None:
+                self.hedges += 1
+                tasks.append(asyncio.create_task(self._timed(kwargs, hedge_key, tokens)))
+
+            error = None
+            while tasks:
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                tasks = list(pending)
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _guarded_stream(self, stream, end: float, deadline: float):
+        """
+        Yields the chunks of a streamed completion. Waiting for every chunk is
+        bounded by the call's deadline, and the breaker judges the call when the
+        stream ends rather than when its first byte arrived.
+        """
+        chunks = aiter(stream)
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout_at(end):
+                        chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except TimeoutError:
+            self.timeouts += 1
+            self.breaker.record_failure()
+            error = LLMDeadlineExceeded(f"Groq stream exceeded its {deadline}s deadline")
+            record_error("llm", error)
+            raise error
+        except (asyncio.CancelledError, GeneratorExit):
+            # The consumer went away; free a half-open probe slot without judging Groq
+            self.breaker.probe_in_flight = False
+            raise
+        except Exception as e:
+            self.failures += 1
+            self.breaker.record_failure()
+            record_error("llm", e)
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            await stream.close()
+
+    async def create(self, deadline: float = None, hedge: bool = True, priority: int = None, **kwargs):
+        """
+        Drop-in for `client.chat.completions.create(**kwargs)`.
+        Raises CircuitOpenError without calling Groq while the breaker is open,
+        RateLimitExceeded when no key has capacity within the priority's queue
+        wait, and LLMDeadlineExceeded when `deadline` seconds pass before an answer.
+        With `stream=True` the returned chunk iterator shares that deadline and
+        raises LLMDeadlineExceeded itself when the stream stalls past it.
+        `priority` defaults to the caller's `priority_scope`.
+        """
+        if not self.breaker.allow():
+            error = CircuitOpenError("Groq circuit breaker is open")
+            record_error("llm", error)
+            raise error
+
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        end = loop.time() + (deadline or self.deadline_seconds)
+        attempt = 0
+        tokens = estimate_request_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+
+        while True:
+            try:
+                # Queueing for capacity is bounded by the limiter, not the call deadline
+                key_index = await self.limiter.acquire(kwargs.get("model"), tokens, priority) if self.limiter is not None else 0
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError
+                async with asyncio.timeout(remaining):
+                    response = await self._attempt({**kwargs, "timeout": remaining}, hedge, key_index, tokens)
+                if kwargs.get("stream"):
+                    return self._guarded_stream(response, end, deadline or self.deadline_seconds)
+                self.breaker.record_success()
+                return response
+            except TimeoutError:
+                self.timeouts += 1
+                self.breaker.record_failure()
+                error = LLMDeadlineExceeded(f"Groq call exceeded its {deadline or self.deadline_seconds}s deadline")
+                record_error("llm", error)
+                raise error
+            except RETRYABLE_ERRORS as e:
+                delay = self._retry_delay(e, attempt)
+                if attempt >= self.max_retries or loop.time() + delay >= end:
+                    self.failures += 1
+                    self.breaker.record_failure()
+                    record_error("llm", e)
+                    raise
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"Groq call failed ({type(e).__name__}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except RateLimitExceeded:
+                self.breaker.probe_in_flight = False
+                raise
+            except asyncio.CancelledError:
+                # The caller went away; free a half-open probe slot without judging Groq
+                self.breaker.probe_in_flight = False
+                raise
+            except Exception as e:
+                # Request-level errors (bad request, auth) say nothing about Groq's health
+                self.breaker.record_success()
+                record_error("llm", e)
+                raise
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "breaker": self.breaker.stats(),
+            "rate_limiter": self.limiter.stats() if self.limiter is not None else None,
+        }
+
+
+_llm: ResilientLLM | None = None
+
+
+def get_llm() -> ResilientLLM:
+    """
+    Returns the process-wide ResilientLLM shared by intent detection and response generation.
+    """
+    global _llm
+    if _llm is None:
+        get_async_client()  # fail fast on a missing API key
+        _llm = ResilientLLM.from_settings()
+    return _llm
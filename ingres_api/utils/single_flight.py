@@ -0,0 +1,77 @@
+import asyncio
+import copy
+import hashlib
+import json
+from ingres_api.utils.text import normalize_query
+
+
+def request_key(*parts) -> str:
+    """
+    Stable key for a request: strings are normalized like queries, everything
+    else (e.g. rawData) is hashed from its canonical JSON form.
+    """
+    canonical = [
+        normalize_query(part) if isinstance(part, str) else json.dumps(part, sort_keys=True, default=str)
+        for part in parts
+    ]
+    return hashlib.sha1("\x1f".join(canonical).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        """
+        One upstream call in flight and the number of callers awaiting it.
+        """
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        """
+        Coalesces concurrent identical calls: the first caller for a key starts
+        the upstream coroutine in a detached task, and every caller with the same
+        key (the first included) awaits that task. Cancelling one caller never
+        cancels the others; the task is cancelled only once nobody awaits it.
+        """
+        self.name = name
+        self._inflight = {}
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def _forget(self, key: str, call: _Call):
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    async def do(self, key: str, factory):
+        """
+        Runs `factory()` unless a call for `key` is already in flight.
+        Every caller gets its own copy of the shared result.
+        """
+        self.calls += 1
+        call = self._inflight.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(factory()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._inflight[key] = call
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last caller gave up: stop the upstream call, and let a new caller start afresh
+                self._forget(key, call)
+                call.task.cancel()
+        return copy.deepcopy(result)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
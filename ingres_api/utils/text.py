@@ -0,0 +1,11 @@
+import re
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a user query used as a cache / de-duplication key:
+    lower-cased, whitespace collapsed, trailing punctuation removed.
+    """
+    return _WHITESPACE.sub(" ", query).strip().lower().rstrip("?!. ")
@@ -0,0 +1,52 @@
+import threading
+from ingres_api.utils.logger import logger
+
+_tokenizer = None
+
+
+def set_tokenizer(tokenizer):
+    """
+    Registers the local (HuggingFace) tokenizer used for prompt-size accounting.
+    """
+    global _tokenizer
+    _tokenizer = tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with the local tokenizer, or estimates ~4 characters per
+    token when none is registered.
+    """
+    if not text:
+        return 0
+    if _tokenizer is not None:
+        return len(_tokenizer.tokenize(text))
+    return len(text) // 4 + 1
+
+
+class PromptSizeTracker:
+    def __init__(self):
+        """
+        Per-component prompt-size counters, so token savings can be verified.
+        """
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, component: str, tokens: int, uuid: str | None = None):
+        with self._lock:
+            entry = self._totals.setdefault(component, {"requests": 0, "tokens": 0, "last": 0, "max": 0})
+            entry["requests"] += 1
+            entry["tokens"] += tokens
+            entry["last"] = tokens
+            entry["max"] = max(entry["max"], tokens)
+        logger.info(f"Prompt size for {component}: {tokens} tokens" + (f" ({uuid})" if uuid else ""))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                component: {**entry, "avg": entry["tokens"] / entry["requests"]}
+                for component, entry in self._totals.items()
+            }
+
+
+prompt_sizes = PromptSizeTracker()
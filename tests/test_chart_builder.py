@@ -0,0 +1,71 @@
+from ingres_api.natural_response.chart_builder import build_visualization
+
+
+def test_historical_result_for_two_states_draws_one_line_per_state():
+    rows = [
+        {"state_name": "Punjab", "year": 2022, "stage_of_gw_extraction": 160},
+        {"state_name": "Haryana", "year": 2022, "stage_of_gw_extraction": 130},
+        {"state_name": "Punjab", "year": 2023, "stage_of_gw_extraction": 164},
+        {"state_name": "Haryana", "year": 2023, "stage_of_gw_extraction": 136},
+    ]
+
+    chart = build_visualization("get_historical_data", rows)
+
+    assert chart["type"] == "line"
+    assert chart["labels"] == ["2022", "2023"]
+    assert "data" not in chart
+    assert chart["datasets"] == [
+        {"label": "Punjab", "data": [160, 164]},
+        {"label": "Haryana", "data": [130, 136]},
+    ]
+
+
+def test_missing_years_are_gaps_in_their_line():
+    rows = [
+        {"state_name": "Punjab", "year": 2022, "total_annual_extraction": 30},
+        {"state_name": "Haryana", "year": 2023, "total_annual_extraction": 12},
+    ]
+
+    chart = build_visualization("get_historical_data", {"results": rows})
+
+    assert chart["datasets"] == [
+        {"label": "Punjab", "data": [30, None]},
+        {"label": "Haryana", "data": [None, 12]},
+    ]
+
+
+def test_duplicate_rows_average_depths_and_sum_volumes():
+    depths = [
+        {"district_name": "Amritsar", "ground_water_depth": 20},
+        {"district_name": "Amritsar", "ground_water_depth": 30},
+        {"district_name": "Ludhiana", "ground_water_depth": 10},
+    ]
+    extraction = [
+        {"district_name": "Amritsar", "total_annual_extraction": 100},
+        {"district_name": "Amritsar", "total_annual_extraction": 50},
+        {"district_name": "Ludhiana", "total_annual_extraction": 80},
+    ]
+
+    depth_chart = build_visualization("find_units_by_metric_value", depths)
+    extraction_chart = build_visualization("find_units_by_metric_value", extraction)
+
+    assert depth_chart["labels"] == ["Amritsar", "Ludhiana"]
+    assert depth_chart["data"] == [25, 10]
+    assert extraction_chart["data"] == [150, 80]
+
+
+def test_single_place_history_stays_one_line():
+    rows = [
+        {"state_name": "Punjab", "year": 2023, "stage_of_gw_extraction": 164},
+        {"state_name": "Punjab", "year": 2022, "stage_of_gw_extraction": 160},
+    ]
+
+    chart = build_visualization("get_historical_data", rows)
+
+    assert chart == {
+        "type": "line",
+        "labels": ["2022", "2023"],
+        "data": [160, 164],
+        "x_axis": "Year",
+        "y_axis": "Stage Of Groundwater Extraction",
+    }
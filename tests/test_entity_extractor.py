@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ingres_api.detect_intent.entity_extractor import DEFINITION_TERMS, METRIC_KEYWORDS, EntityExtractor
+
+EXAMPLES_FILE = Path(__file__).parent.parent / "ingres_api" / "detect_intent" / "few_shot_examples.json"
+DEFINITIONS = [
+    example for example in json.loads(EXAMPLES_FILE.read_text(encoding="utf-8"))
+    if example["response"]["intent"] == "definition"
+]
+DEFINED_TERMS = {example["response"]["entities"]["term"] for example in DEFINITIONS}
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return EntityExtractor()
+
+
+def test_definition_terms_are_stored_definitions():
+    assert set(DEFINITION_TERMS) <= set(METRIC_KEYWORDS)
+    assert set(DEFINITION_TERMS.values()) <= DEFINED_TERMS
+
+
+@pytest.mark.parametrize("query", [
+    "what is stage of gw extraction",
+    "define non monsoon recharge from rainfall",
+    "non-monsoon recharge from other sources ka matlab kya hai",
+    "explain net groundwater availability",
+    "what does semi critical mean",
+])
+def test_extracted_term_resolves_to_a_definition(extractor, query):
+    assert extractor.extract(query)["term"] in DEFINED_TERMS
+
+
+@pytest.mark.parametrize("example", DEFINITIONS, ids=lambda example: example["query"])
+def test_definition_queries_extract_the_stored_term(extractor, example):
+    term = extractor.extract(example["query"]).get("term")
+    if term is None:
+        pytest.skip("no keyword for this term")
+    assert term == example["response"]["entities"]["term"]
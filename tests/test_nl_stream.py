@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import pytest
+
+from ingres_api.natural_response.natural_response import NaturalLanguageResponse, NlResponseStreamParser
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_parser_joins_surrogate_pairs_split_across_chunks(chunk_size):
+    text = 'Levels fell 😀 in "Punjab"\n'
+    raw = json.dumps({"nl_response": text})  # ensure_ascii writes the emoji as a \ud83d\ude00 pair
+    parser = NlResponseStreamParser()
+
+    streamed = "".join(parser.feed(raw[i:i + chunk_size]) for i in range(0, len(raw), chunk_size))
+
+    assert streamed == text
+    assert parser.text == text
+
+
+def test_parser_keeps_a_lone_high_surrogate():
+    parser = NlResponseStreamParser()
+    assert parser.feed('{"nl_response": "a\\ud83d b"}') == json.loads('"a\\ud83d b"')
+
+
+def test_prompt_build_failure_is_an_error_event():
+    response = NaturalLanguageResponse.__new__(NaturalLanguageResponse)
+    response.templates = None
+
+    async def build_messages(*args, **kwargs):
+        raise RuntimeError("embedding model unavailable")
+
+    response._build_messages = build_messages
+
+    async def collect():
+        return [event async for event in response.stream_response("get_state_metric", "recharge in Punjab", {})]
+
+    events = asyncio.run(collect())
+
+    assert events == [("error", {"message": "Error generating response: embedding model unavailable"})]
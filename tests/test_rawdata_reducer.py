@@ -0,0 +1,35 @@
+from ingres_api.natural_response.rawdata_reducer import estimate_tokens, reduce_raw_data, to_compact_json
+
+
+def test_truncated_payload_fits_the_budget_after_escaping():
+    rawData = {"notes": ['"quoted" text with\\backslashes\n' * 20, "x" * 2000]}
+
+    for budget in (20, 100, 300):
+        payload, reduced = reduce_raw_data(rawData, token_budget=budget)
+
+        assert reduced
+        assert estimate_tokens(to_compact_json(payload)) <= budget
+        assert payload["truncated"]
+
+
+def test_summary_keeps_the_wrapper_scalars():
+    rows = [{"district_name": f"District {i}", "stage_of_gw_extraction": i} for i in range(200)]
+    rawData = {"state": "Punjab", "year": 2023, "unit": "%", "results": rows}
+
+    payload, reduced = reduce_raw_data(rawData, token_budget=400)
+
+    assert reduced
+    assert payload["state"] == "Punjab"
+    assert payload["year"] == 2023
+    assert payload["unit"] == "%"
+    assert payload["row_count"] == 200
+    assert "results" not in payload
+
+
+def test_label_value_dicts_are_not_duplicated_into_the_summary():
+    rawData = {f"metric_{i}": i for i in range(300)}
+
+    payload, reduced = reduce_raw_data(rawData, token_budget=200)
+
+    assert reduced
+    assert "metric_0" not in payload
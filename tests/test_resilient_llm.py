@@ -0,0 +1,280 @@
+"""
+ResilientLLM against a local fake Groq: the real AsyncGroq client talks to an
+httpx.MockTransport that answers from a per-test script.
+"""
+import asyncio
+import json
+import time
+
+import groq
+import httpx
+import pytest
+
+from ingres_api.utils import groq_client
+from ingres_api.utils.resilient_llm import CircuitBreaker, CircuitOpenError, LLMDeadlineExceeded, ResilientLLM
+
+MODEL = "fake-model"
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": MODEL,
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}
+
+
+class ChunkStream(httpx.AsyncByteStream):
+    def __init__(self, texts: list, stall: float):
+        """
+        Server-sent completion chunks, then a `stall`-second pause before [DONE].
+        """
+        self.texts = texts
+        self.stall = stall
+
+    async def __aiter__(self):
+        for text in self.texts:
+            chunk = {
+                "id": "chatcmpl-1",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": MODEL,
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        await asyncio.sleep(self.stall)
+        yield b"data: [DONE]\n\n"
+
+
+class FakeGroq:
+    def __init__(self):
+        """
+        Answers chat completions from `script`, one step per request (200 once it runs out):
+        ("ok",), ("status", code, headers), ("slow", seconds) or ("stream", texts, stall seconds).
+        """
+        self.script = []
+        self.requests = 0
+        self.cancelled = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        step = self.script.pop(0) if self.script else ("ok",)
+        if step[0] == "status":
+            _, code, headers = step
+            return httpx.Response(code, headers=headers, json={"error": {"message": f"fake {code}"}})
+        if step[0] == "stream":
+            _, texts, stall = step
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=ChunkStream(texts, stall))
+        if step[0] == "slow":
+            try:
+                await asyncio.sleep(step[1])
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return httpx.Response(200, json=COMPLETION)
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    fake = FakeGroq()
+    client = groq.AsyncGroq(
+        api_key="test-key",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(fake.handle)),
+    )
+    monkeypatch.setattr(groq_client, "_async_clients", {0: client})
+    return fake
+
+
+def make_llm(**overrides) -> ResilientLLM:
+    options = dict(
+        deadline_seconds=2.0,
+        max_retries=3,
+        backoff_base=0.01,
+        backoff_max=0.05,
+        hedge_enabled=False,
+        hedge_min_samples=3,
+        hedge_min_delay=0.05,
+        breaker=CircuitBreaker(failure_threshold=3, reset_seconds=0.2),
+    )
+    options.update(overrides)
+    return ResilientLLM(**options)
+
+
+def create(llm: ResilientLLM, **kwargs):
+    return llm.create(model=MODEL, messages=MESSAGES, **kwargs)
+
+
+def test_429_waits_for_retry_after(fake_groq):
+    fake_groq.script = [("status", 429, {"retry-after": "0.3"})]
+    llm = make_llm()
+
+    start = time.monotonic()
+    response = asyncio.run(create(llm))
+
+    assert response.choices[0].message.content == "{}"
+    assert time.monotonic() - start >= 0.3
+    assert fake_groq.requests == 2
+    assert llm.retries == 1
+
+
+def test_retry_after_ms_takes_precedence():
+    error = groq.RateLimitError(
+        "limited",
+        response=httpx.Response(429, headers={"retry-after": "9", "retry-after-ms": "250"},
+                                request=httpx.Request("POST", "https://fake")),
+        body=None,
+    )
+    assert make_llm()._retry_delay(error, attempt=0) == 0.25
+
+
+def test_5xx_is_retried_with_backoff(fake_groq):
+    fake_groq.script = [("status", 500, {}), ("status", 503, {})]
+    llm = make_llm()
+
+    asyncio.run(create(llm))
+
+    assert fake_groq.requests == 3
+    assert llm.retries == 2
+    assert llm.breaker.state == "closed"
+
+
+def test_backoff_is_jittered_and_capped():
+    llm = make_llm(backoff_base=0.1, backoff_max=0.3)
+    error = groq.InternalServerError(
+        "boom", response=httpx.Response(500, request=httpx.Request("POST", "https://fake")), body=None,
+    )
+    for attempt in range(6):
+        assert 0.0 <= llm._retry_delay(error, attempt) <= min(0.3, 0.1 * 2 ** attempt)
+
+
+def test_5xx_gives_up_after_max_retries(fake_groq):
+    fake_groq.script = [("status", 500, {})] * 3
+    llm = make_llm(max_retries=2)
+
+    with pytest.raises(groq.InternalServerError):
+        asyncio.run(create(llm))
+
+    assert fake_groq.requests == 3
+    assert llm.failures == 1
+
+
+def test_deadline_expiry(fake_groq):
+    fake_groq.script = [("slow", 5.0)]
+    llm = make_llm()
+
+    start = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        asyncio.run(create(llm, deadline=0.2))
+
+    assert time.monotonic() - start < 1.0
+    assert llm.timeouts == 1
+    assert fake_groq.cancelled == 1
+
+
+def test_hedge_wins_and_cancels_the_slow_request(fake_groq):
+    llm = make_llm(hedge_enabled=True)
+    llm.latencies[MODEL].extend([0.01] * 3)  # recent p95 below the minimum hedge delay
+    fake_groq.script = [("slow", 5.0)]
+
+    async def scenario():
+        response = await create(llm)
+        await asyncio.sleep(0.01)  # let the cancelled primary unwind
+        return response
+
+    start = time.monotonic()
+    response = asyncio.run(scenario())
+
+    assert response.choices[0].message.content == "{}"
+    assert time.monotonic() - start < 1.0
+    assert fake_groq.requests == 2
+    assert llm.hedges == 1
+    assert llm.hedge_wins == 1
+    assert fake_groq.cancelled == 1
+
+
+def test_breaker_open_half_open_closed(fake_groq):
+    llm = make_llm(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=0.2))
+
+    async def scenario():
+        fake_groq.script = [("status", 500, {})] * 2
+        for _ in range(2):
+            with pytest.raises(groq.InternalServerError):
+                await create(llm)
+        assert llm.breaker.state == "open"
+
+        # Open: rejected without reaching Groq
+        with pytest.raises(CircuitOpenError):
+            await create(llm)
+        assert fake_groq.requests == 2
+
+        # Half-open: a failed probe re-opens the circuit
+        await asyncio.sleep(0.25)
+        fake_groq.script = [("status", 500, {})]
+        with pytest.raises(groq.InternalServerError):
+            await create(llm)
+        assert llm.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await create(llm)
+
+        # Half-open: only one probe at a time, and its success closes the circuit
+        await asyncio.sleep(0.25)
+        fake_groq.script = [("slow", 0.1)]
+        probe = asyncio.create_task(create(llm))
+        await asyncio.sleep(0.02)
+        assert llm.breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            await create(llm)
+        await probe
+        assert llm.breaker.state == "closed"
+        await create(llm)
+
+    asyncio.run(scenario())
+
+    assert fake_groq.requests == 5
+    assert llm.breaker.opens == 2
+
+
+async def collect(stream) -> list:
+    texts = []
+    async for chunk in stream:
+        texts.append(chunk.choices[0].delta.content)
+    return texts
+
+
+def test_stalled_stream_hits_the_deadline(fake_groq):
+    fake_groq.script = [("stream", ["Hello"], 5.0)]
+    llm = make_llm()
+    received = []
+
+    async def scenario():
+        stream = await create(llm, stream=True, deadline=0.3)
+        async for chunk in stream:
+            received.append(chunk.choices[0].delta.content)
+
+    start = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        asyncio.run(scenario())
+
+    assert received == ["Hello"]
+    assert time.monotonic() - start < 1.0
+    assert llm.timeouts == 1
+    assert llm.breaker.consecutive_failures == 1
+
+
+def test_stream_is_judged_by_the_breaker_when_it_ends(fake_groq):
+    llm = make_llm(breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0.0))
+    llm.breaker.record_failure()
+    fake_groq.script = [("stream", ["Hel", "lo"], 0.0)]
+
+    async def scenario():
+        stream = await create(llm, stream=True)
+        assert llm.breaker.state == "half_open"  # the probe is still running
+        with pytest.raises(CircuitOpenError):
+            await create(llm)
+        return await collect(stream)
+
+    assert asyncio.run(scenario()) == ["Hel", "lo"]
+    assert llm.breaker.state == "closed"
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from ingres_api.detect_intent.semantic_cache import SemanticCache
+
+RESULT = {"intent": "list_units_by_condition", "entities": {"condition": "safe"}, "confidence": 0.9}
+
+
+def vector(*values) -> np.ndarray:
+    v = np.asarray(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ({"state_name": "Punjab", "condition": "safe"}, {"state_name": "Punjab", "condition": "critical"}),
+    ({"state_name": "Punjab", "unit_type": "district"}, {"state_name": "Punjab", "unit_type": "block"}),
+    ({"term": "safe"}, {"term": "semi-critical"}),
+])
+def test_near_identical_query_with_another_key_entity_misses(stored, asked):
+    cache = SemanticCache(dim=3, threshold=0.9, ttl_seconds=60, max_entries=10)
+    cache.store("list safe districts in Punjab", vector(1, 0, 0), RESULT, stored)
+
+    assert cache.lookup(vector(1, 0.01, 0), asked) is None
+    assert cache.entity_mismatches == 1
+    assert cache.lookup(vector(1, 0.01, 0), stored) == RESULT